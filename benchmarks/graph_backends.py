@@ -0,0 +1,68 @@
+"""Сравнение движков рендера графика: matplotlib против Pillow.
+
+Запуск: python benchmarks/graph_backends.py [число_повторов]
+"""
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot"))
+
+from graph_service import get_graph_renderer  # noqa: E402
+
+warnings.filterwarnings("ignore")
+
+
+def make_points(count: int = 30):
+    start = datetime(2026, 1, 1, 20, 30)
+    return [(start + timedelta(days=i), (i * 7) % 5 + 1) for i in range(count)]
+
+
+def bench(backend: str, points, repeat: int):
+    started = time.perf_counter()
+    render = get_graph_renderer(backend)
+    render(points)
+    first_call = time.perf_counter() - started
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        png = render(points)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    render(points)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "first_call_ms": first_call * 1000,
+        "median_ms": timings[len(timings) // 2] * 1000,
+        "p95_ms": timings[int(len(timings) * 0.95) - 1] * 1000,
+        "peak_alloc_kb": peak / 1024,
+        "png_kb": len(png) / 1024,
+    }
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    points = make_points()
+
+    # Pillow первым, чтобы его «первый вызов» не включал импорт matplotlib
+    results = {backend: bench(backend, points, repeat) for backend in ("pillow", "matplotlib")}
+
+    columns = ["first_call_ms", "median_ms", "p95_ms", "peak_alloc_kb", "png_kb"]
+    print(f"{'backend':<12}" + "".join(f"{c:>16}" for c in columns))
+    for backend, stats in results.items():
+        print(f"{backend:<12}" + "".join(f"{stats[c]:>16.1f}" for c in columns))
+
+    speedup = results["matplotlib"]["median_ms"] / results["pillow"]["median_ms"]
+    print(f"\npillow is {speedup:.1f}x faster (median, {len(points)} points, {repeat} runs)")
+
+
+if __name__ == "__main__":
+    main()
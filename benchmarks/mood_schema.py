@@ -0,0 +1,116 @@
+"""Бенчмарк запросов к mood_entries до и после миграции на mood_code.
+
+Строит синтетическую базу в старой схеме (строковый mood, отдельные индексы
+на user_id и created_at), замеряет запросы графика, дня и последних записей,
+прогоняет миграцию из migrations.py и замеряет те же запросы ещё раз.
+Запуск: python benchmarks/mood_schema.py [пользователей] [записей_на_пользователя]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot"))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+from migrations import migrate_mood_codes  # noqa: E402
+from moods import MOOD_LABELS  # noqa: E402
+
+OLD_SCHEMA = [
+    "CREATE TABLE mood_entries (id INTEGER NOT NULL PRIMARY KEY, user_id BIGINT NOT NULL, "
+    "mood VARCHAR NOT NULL, text TEXT NOT NULL, created_at DATETIME)",
+    "CREATE INDEX ix_mood_entries_id ON mood_entries (id)",
+    "CREATE INDEX ix_mood_entries_user_id ON mood_entries (user_id)",
+    "CREATE INDEX ix_mood_entries_created_at ON mood_entries (created_at)",
+]
+
+QUERIES = {
+    "graph": "SELECT * FROM mood_entries WHERE user_id = ? ORDER BY created_at DESC LIMIT 30",
+    "day": "SELECT * FROM mood_entries WHERE user_id = ? "
+           "AND created_at >= ? AND created_at <= ? ORDER BY created_at DESC",
+    "recent": "SELECT * FROM mood_entries WHERE user_id = ? AND id != ? "
+              "ORDER BY created_at DESC LIMIT 7",
+}
+
+START = datetime(2024, 1, 1)
+
+
+def build_database(path: str, users: int, per_user: int):
+    rng = random.Random(42)
+    labels = list(MOOD_LABELS.values())
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        for statement in OLD_SCHEMA:
+            conn.exec_driver_sql(statement)
+        # Записи разных пользователей перемешаны по времени, как в живой базе
+        rows = []
+        for day in range(per_user):
+            for user_id in range(1, users + 1):
+                created_at = START + timedelta(days=day, seconds=rng.randint(0, 86399))
+                rows.append((user_id, rng.choice(labels), "Обычный день, ничего особенного", created_at))
+            if len(rows) >= 50000:
+                conn.exec_driver_sql(
+                    "INSERT INTO mood_entries (user_id, mood, text, created_at) VALUES (?, ?, ?, ?)", rows
+                )
+                rows = []
+        if rows:
+            conn.exec_driver_sql(
+                "INSERT INTO mood_entries (user_id, mood, text, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+    return engine
+
+
+def run_queries(engine, users: int, per_user: int, rounds: int = 2000) -> dict:
+    rng = random.Random(7)
+    timings = {}
+    with engine.connect() as conn:
+        conn.exec_driver_sql("ANALYZE")
+        for name, sql in QUERIES.items():
+            started = time.perf_counter()
+            for _ in range(rounds):
+                day = START + timedelta(days=rng.randrange(per_user))
+                conn.exec_driver_sql(sql, _params(name, rng.randint(1, users), day)).fetchall()
+            timings[name] = (time.perf_counter() - started) / rounds * 1000
+    return timings
+
+
+def _params(name: str, user_id: int, day: datetime) -> tuple:
+    if name == "day":
+        return user_id, day, day + timedelta(days=1) - timedelta(microseconds=1)
+    if name == "recent":
+        return user_id, 0
+    return (user_id,)
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    per_user = int(sys.argv[2]) if len(sys.argv) > 2 else 365
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        engine = build_database(path, users, per_user)
+        size_before = os.path.getsize(path)
+        before = run_queries(engine, users, per_user)
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            migrate_mood_codes(conn)
+        migration_seconds = time.perf_counter() - started
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        size_after = os.path.getsize(path)
+        after = run_queries(engine, users, per_user)
+        engine.dispose()
+
+    print(f"{users * per_user} entries, migration took {migration_seconds:.2f}s")
+    print(f"file size: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+    print(f"{'query':>8}{'before_ms':>12}{'after_ms':>12}{'speedup':>10}")
+    for name in QUERIES:
+        print(f"{name:>8}{before[name]:>12.3f}{after[name]:>12.3f}{before[name] / after[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
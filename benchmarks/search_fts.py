@@ -0,0 +1,116 @@
+"""Бенчмарк полнотекстового поиска: FTS5-индекс против LIKE-скана.
+
+Строит базу в текущей схеме (с триггерами FTS), наполняет её синтетическими
+записями и замеряет поиск одного пользователя по частым и редким словам.
+Запуск: python benchmarks/search_fts.py [записей] [пользователей]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot"))
+
+from sqlalchemy import create_engine  # noqa: E402
+
+import models  # noqa: E402,F401
+from database import Base  # noqa: E402
+from migrations import seed_moods  # noqa: E402
+from search import CANDIDATES_SQL, NO_BOUND, SEARCH_CANDIDATES, build_match, ensure_search_index, query_stems, score_entries  # noqa: E402
+
+COMMON = (
+    "день работа сон устал прогулка друзья дом семья кофе утро вечер погода "
+    "настроение спорт книга фильм дождь солнце обед ужин встреча"
+).split()
+RARE = "концерт море горы экзамен свадьба переезд отпуск".split()
+
+START = datetime(2020, 1, 1)
+
+
+def make_text(rng: random.Random) -> str:
+    words = [rng.choice(COMMON) for _ in range(rng.randint(8, 40))]
+    if rng.random() < 0.02:
+        words.insert(rng.randrange(len(words)), rng.choice(RARE))
+    return " ".join(words).capitalize()
+
+
+def build_database(path: str, entries: int, users: int):
+    rng = random.Random(42)
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        seed_moods(conn)
+        ensure_search_index(conn)
+    with engine.begin() as conn:
+        batch = []
+        for i in range(entries):
+            created_at = START + timedelta(minutes=i)
+            batch.append((rng.randint(1, users), rng.randint(1, 5), make_text(rng), created_at, created_at.date()))
+            if len(batch) >= 50000:
+                conn.exec_driver_sql(
+                    "INSERT INTO mood_entries (user_id, mood_code, text, created_at, local_date) "
+                    "VALUES (?, ?, ?, ?, ?)", batch
+                )
+                batch = []
+        if batch:
+            conn.exec_driver_sql(
+                "INSERT INTO mood_entries (user_id, mood_code, text, created_at, local_date) "
+                "VALUES (?, ?, ?, ?, ?)", batch
+            )
+    return engine
+
+
+def timed(conn, run, users: int, words, rounds: int) -> float:
+    rng = random.Random(7)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        run(conn, rng.randint(1, users), rng.choice(words))
+    return (time.perf_counter() - started) / rounds * 1000
+
+
+def fts_search(conn, user_id: int, word: str):
+    # То же, что search_entries: кандидаты из FTS и ранжирование в Python
+    stems = query_stems(word)
+    params = {"match": build_match(user_id, stems), "top": NO_BOUND, "limit": SEARCH_CANDIDATES}
+    rows = conn.execute(CANDIDATES_SQL, params).fetchall()
+    sorted(score_entries(rows, stems), key=lambda item: (item[0], item[1].id), reverse=True)[:6]
+
+
+def like_search(conn, user_id: int, word: str):
+    conn.exec_driver_sql(
+        "SELECT id, text FROM mood_entries WHERE user_id = ? AND text LIKE ? ORDER BY created_at DESC LIMIT 6",
+        (user_id, f"%{word}%"),
+    ).fetchall()
+
+
+def like_all(conn, user_id: int, word: str):
+    # Полный проход LIKE по таблице — столько стоит любой поиск без индекса по тексту
+    conn.exec_driver_sql("SELECT count(*) FROM mood_entries WHERE text LIKE ?", (f"%{word}%",)).fetchall()
+
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        started = time.perf_counter()
+        engine = build_database(path, entries, users)
+        print(f"{entries} entries for {users} users built in {time.perf_counter() - started:.1f}s, "
+              f"{os.path.getsize(path) / 1e6:.0f} MB")
+
+        with engine.connect() as conn:
+            conn.exec_driver_sql("ANALYZE")
+            print(f"{'words':>8}{'fts_ms':>10}{'like_ms':>10}{'scan_ms':>10}")
+            for name, words in (("common", COMMON), ("rare", RARE)):
+                fts = timed(conn, fts_search, users, words, 500)
+                like = timed(conn, like_search, users, words, 500)
+                scan = timed(conn, like_all, users, words, 3)
+                print(f"{name:>8}{fts:>10.2f}{like:>10.2f}{scan:>10.1f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
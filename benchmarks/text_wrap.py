@@ -0,0 +1,86 @@
+"""Микробенчмарк переноса текста карточки: старый O(слов²) против layout_text.
+
+Заодно сверяет, что переносы и высоты строк совпадают с прежним алгоритмом.
+Запуск: python benchmarks/text_wrap.py [число_повторов]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bot"))
+
+from PIL import Image, ImageDraw  # noqa: E402
+
+from image_generator import get_fonts, layout_text, _token_metrics  # noqa: E402
+
+WORDS = (
+    "Настроение стабильно растёт уже третий день подряд продолжай в том же духе "
+    "The only way to do great work is to love what you do Steve Jobs "
+    "неделя работа сон прогулка друзья усталость радость тревога спорт книга"
+).split()
+
+
+def legacy_layout(draw, text, font, max_width):
+    words = text.split()
+    lines = []
+    current_line = ""
+    for word in words:
+        test_line = f"{current_line} {word}".strip()
+        bbox = draw.textbbox((0, 0), test_line, font=font)
+        if bbox[2] - bbox[0] <= max_width:
+            current_line = test_line
+        else:
+            if current_line:
+                lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+
+    result = []
+    for line in lines:
+        bbox = draw.textbbox((0, 0), line, font=font)
+        result.append((line, bbox[3] - bbox[1]))
+    return result
+
+
+def make_text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def timed(func, texts, draw, font, width, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(draw, text, font, width)
+    return (time.perf_counter() - started) / (repeat * len(texts)) * 1000
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    rng = random.Random(42)
+    draw = ImageDraw.Draw(Image.new("RGB", (10, 10)))
+    _, _, text_font, quote_font = get_fonts()
+    width = 1080 - 160 - 40
+
+    mismatches = 0
+    for _ in range(300):
+        font = rng.choice([text_font, quote_font])
+        text = make_text(rng, rng.randint(1, 120))
+        max_width = rng.randint(150, width)
+        if legacy_layout(draw, text, font, max_width) != layout_text(draw, text, font, max_width):
+            mismatches += 1
+    print(f"equivalence: {mismatches} mismatches in 300 random texts")
+
+    print(f"{'words':>6}{'legacy_ms':>12}{'layout_ms':>12}{'speedup':>10}")
+    for words in (20, 60, 200, 600):
+        texts = [make_text(rng, words) for _ in range(10)]
+        legacy = timed(legacy_layout, texts, draw, quote_font, width, repeat)
+        _token_metrics.clear()
+        layout_text(draw, texts[0], quote_font, width)
+        fast = timed(layout_text, texts, draw, quote_font, width, repeat)
+        print(f"{words:>6}{legacy:>12.2f}{fast:>12.2f}{legacy / fast:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
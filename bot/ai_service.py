@@ -1,18 +1,137 @@
+import asyncio
 import json
 import logging
+import random
 from typing import Optional
 
-from mistralai import Mistral
+import aiohttp
 
-from config import MISTRAL_API_KEY
+from config import (
+    MISTRAL_API_KEY,
+    MISTRAL_API_URL,
+    MISTRAL_MODEL,
+    AI_TIMEOUT,
+    AI_MAX_CONCURRENCY,
+    AI_MAX_RETRIES,
+    AI_DEADLINE,
+)
+from metrics import AI_SECONDS, AI_ERRORS, timed
 
 logger = logging.getLogger(__name__)
 
-
-def get_mistral_client() -> Mistral:
-    return Mistral(api_key=MISTRAL_API_KEY)
-
-
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class MistralAPIError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"Mistral API returned {status}: {message}")
+        self.status = status
+
+
+class MistralClient:
+    """Долгоживущий async-клиент Mistral Chat API.
+
+    Держит одну aiohttp-сессию с пулом keep-alive соединений, ограничивает
+    число одновременных запросов семафором и повторяет запрос с
+    экспоненциальной задержкой на 429/5xx и сетевых ошибках. Retry-After
+    ограничен таймаутом запроса, слот семафора на время паузы отпускается,
+    а весь вызов с повторами укладывается в ``deadline``.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        base_url: str = MISTRAL_API_URL,
+        timeout: float = AI_TIMEOUT,
+        max_concurrency: int = AI_MAX_CONCURRENCY,
+        max_retries: int = AI_MAX_RETRIES,
+        deadline: float = AI_DEADLINE,
+        backoff_base: float = 0.5,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.max_retry_delay = timeout
+        self.deadline = deadline
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Accept": "application/json",
+                },
+                timeout=self.timeout,
+            )
+        return self._session
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return max(0.0, min(float(retry_after), self.max_retry_delay))
+            except ValueError:
+                pass
+        return self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+
+    async def chat(self, messages: list, model: str = MISTRAL_MODEL, temperature: float = 0.8) -> str:
+        payload = {"model": model, "messages": messages, "temperature": temperature}
+        url = f"{self.base_url}/v1/chat/completions"
+
+        with AI_SECONDS.time("chat"):
+            try:
+                return await asyncio.wait_for(self._post(url, payload), self.deadline)
+            except Exception:
+                AI_ERRORS.inc("chat")
+                raise
+
+    async def _post(self, url: str, payload: dict) -> str:
+        attempt = 0
+        while True:
+            retry_after = None
+            # Слот занят только на время самого запроса, не на паузу перед повтором
+            async with self._semaphore:
+                try:
+                    async with self._get_session().post(url, json=payload) as response:
+                        if response.status == 200:
+                            data = await response.json()
+                            return data["choices"][0]["message"]["content"]
+
+                        body = await response.text()
+                        error = MistralAPIError(response.status, body[:200])
+                        if response.status not in RETRY_STATUSES:
+                            raise error
+                        retry_after = response.headers.get("Retry-After")
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = e
+
+            if attempt >= self.max_retries:
+                raise error
+
+            delay = self._retry_delay(attempt, retry_after)
+            logger.warning(f"Mistral request failed ({error}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+mistral_client = MistralClient(api_key=MISTRAL_API_KEY)
+
+
+def get_mistral_client() -> MistralClient:
+    return mistral_client
+
+
+@timed(AI_SECONDS, "analyze_mood")
 async def analyze_mood(
     mood: str,
     text: str,
@@ -58,8 +177,7 @@ Make the trend analysis personal and insightful based on the user's input.
 """
 
     try:
-        response = client.chat.complete(
-            model="mistral-large-latest",
+        content = await client.chat(
             messages=[
                 {
                     "role": "system",
@@ -73,7 +191,6 @@ Make the trend analysis personal and insightful based on the user's input.
             temperature=0.8,
         )
 
-        content = response.choices[0].message.content
         json_str = content.strip()
 
         if json_str.startswith("```json"):
@@ -93,6 +210,7 @@ Make the trend analysis personal and insightful based on the user's input.
         }
 
     except Exception as e:
+        AI_ERRORS.inc("analyze_mood")
         logger.error(f"Mistral API error: {e}")
         return {
             "trend": "Analysis temporarily unavailable",
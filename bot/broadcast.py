@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterable, Awaitable, Callable, Iterable, List, Union
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_MAX_RETRIES
+from metrics import BROADCAST_SEND_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Пользователь заблокировал бота, удалил аккаунт или чат не найден — повторять бессмысленно
+PERMANENT_ERRORS = (TelegramForbiddenError, TelegramNotFound)
+# BadRequest бывает и из-за самого сообщения (разметка, parse_mode) — недоступным
+# получатель считается только по этим ответам, иначе одно кривое сообщение отпишет всех
+UNREACHABLE_BAD_REQUESTS = ("chat not found", "user is deactivated", "peer_id_invalid")
+# Сбои на стороне сети или Telegram — стоит повторить
+TRANSIENT_ERRORS = (TelegramServerError, TelegramNetworkError)
+
+
+def is_unreachable(error: TelegramBadRequest) -> bool:
+    message = error.message.lower()
+    return any(reason in message for reason in UNREACHABLE_BAD_REQUESTS)
+
+
+class TokenBucket:
+    """Глобальный лимит отправки: rate сообщений в секунду со всплеском до capacity"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Останавливает все отправки, например по retry_after от Telegram"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class BroadcastResult:
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    unreachable: List[int] = field(default_factory=list)
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.duration if self.duration else 0.0
+
+
+class Broadcaster:
+    """Рассылка пулом отправителей с общим token bucket.
+
+    Каждый получатель получает одно сообщение, поэтому лимит Telegram
+    «1 сообщение в секунду на чат» соблюдается сам собой, а глобальный
+    (~30 в секунду) держит TokenBucket. TelegramRetryAfter ставит на паузу
+    всех отправителей, а не только тот, что его получил.
+    """
+
+    def __init__(
+        self,
+        rate: float = BROADCAST_RATE,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        max_retries: int = BROADCAST_MAX_RETRIES,
+    ):
+        self.bucket = TokenBucket(rate)
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+
+    async def _send_one(self, chat_id: int, send: Callable[[int], Awaitable], result: BroadcastResult):
+        attempt = 0
+        while True:
+            await self.bucket.acquire()
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                await send(chat_id)
+                result.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                outcome = "flood"
+                logger.warning(f"Flood limit hit, pausing broadcast for {e.retry_after}s")
+                self.bucket.pause(e.retry_after)
+                if attempt >= self.max_retries:
+                    logger.error(f"Giving up on chat {chat_id} after {attempt + 1} flood limits")
+                    result.failed += 1
+                    return
+            except PERMANENT_ERRORS as e:
+                outcome = "unreachable"
+                logger.info(f"Chat {chat_id} is unreachable: {e.message}")
+                result.failed += 1
+                result.unreachable.append(chat_id)
+                return
+            except TelegramBadRequest as e:
+                result.failed += 1
+                if is_unreachable(e):
+                    outcome = "unreachable"
+                    logger.info(f"Chat {chat_id} is unreachable: {e.message}")
+                    result.unreachable.append(chat_id)
+                else:
+                    outcome = "error"
+                    logger.error(f"Telegram rejected message to chat {chat_id}: {e.message}")
+                return
+            except TRANSIENT_ERRORS as e:
+                outcome = "transient"
+                if attempt >= self.max_retries:
+                    logger.error(f"Giving up on chat {chat_id}: {e}")
+                    result.failed += 1
+                    return
+                await asyncio.sleep(2 ** attempt)
+            except Exception as e:
+                outcome = "error"
+                logger.error(f"Unexpected error sending to chat {chat_id}: {e}")
+                result.failed += 1
+                return
+            finally:
+                BROADCAST_SEND_SECONDS.observe(time.perf_counter() - started, outcome)
+
+            attempt += 1
+            result.retried += 1
+
+    async def run(
+        self,
+        chat_ids: Union[Iterable[int], AsyncIterable[int]],
+        send: Callable[[int], Awaitable],
+    ) -> BroadcastResult:
+        result = BroadcastResult()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 4)
+        started = time.monotonic()
+
+        async def worker():
+            while True:
+                chat_id = await queue.get()
+                try:
+                    if chat_id is None:
+                        return
+                    await self._send_one(chat_id, send, result)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            if hasattr(chat_ids, "__aiter__"):
+                async for chat_id in chat_ids:
+                    await queue.put(chat_id)
+            else:
+                for chat_id in chat_ids:
+                    await queue.put(chat_id)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        result.duration = time.monotonic() - started
+        return result
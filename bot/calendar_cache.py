@@ -0,0 +1,52 @@
+import logging
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from config import CALENDAR_CACHE_SIZE
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MonthKey = Tuple[int, int, int]
+
+
+class CalendarCache:
+    """LRU отметок календаря: (пользователь, год, месяц) -> {день: код настроения}.
+
+    Листание месяцев туда-обратно не ходит в БД повторно; новая запись
+    сбрасывает только свой месяц.
+    """
+
+    def __init__(self, max_entries: int = CALENDAR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._items: "OrderedDict[MonthKey, Dict[int, int]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int, year: int, month: int) -> Optional[Dict[int, int]]:
+        key = (user_id, year, month)
+        marks = self._items.get(key)
+        if marks is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return marks
+
+    def put(self, user_id: int, year: int, month: int, marks: Dict[int, int]):
+        self._items[(user_id, year, month)] = marks
+        self._items.move_to_end((user_id, year, month))
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def invalidate(self, user_id: int, day: date):
+        self._items.pop((user_id, day.year, day.month), None)
+
+    def clear(self):
+        self._items.clear()
+
+
+calendar_cache = CalendarCache()
+registry.gauge("bot_calendar_cache_hits_total", "Месяцы календаря из кэша", lambda: calendar_cache.hits, kind="counter")
+registry.gauge("bot_calendar_cache_misses_total", "Месяцы календаря из базы", lambda: calendar_cache.misses, kind="counter")
@@ -17,3 +17,97 @@ MOOD_CHECK_TIME = os.getenv("MOOD_CHECK_TIME", "20:30")
 # Канал для обязательной подписки
 CHANNEL_ID = os.getenv("CHANNEL_ID")  # ID канала (начинается с @ или -100...)
 CHANNEL_USERNAME = os.getenv("CHANNEL_USERNAME")  # Username канала для ссылки (без @)
+
+# Mistral API: пул соединений, таймауты и ограничение параллельных запросов
+MISTRAL_API_URL = os.getenv("MISTRAL_API_URL", "https://api.mistral.ai")
+MISTRAL_MODEL = os.getenv("MISTRAL_MODEL", "mistral-large-latest")
+AI_TIMEOUT = float(os.getenv("AI_TIMEOUT", "30"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+# Общий срок одного вызова со всеми повторами и ожиданием очереди
+AI_DEADLINE = float(os.getenv("AI_DEADLINE", "60"))
+
+# Пул процессов для рендера графиков
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "2"))
+RENDER_QUEUE_SIZE = int(os.getenv("RENDER_QUEUE_SIZE", "8"))
+
+# Кэш отрисованных графиков: LRU в памяти + опциональный каталог на диске
+GRAPH_CACHE_MAX_BYTES = int(os.getenv("GRAPH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+GRAPH_CACHE_DIR = os.getenv("GRAPH_CACHE_DIR", "")
+GRAPH_CACHE_DISK_MAX_BYTES = int(os.getenv("GRAPH_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+GRAPH_CACHE_DISK_MAX_AGE_DAYS = float(os.getenv("GRAPH_CACHE_DISK_MAX_AGE_DAYS", "30"))
+
+# Сколько последних file_id загруженных картинок хранить в таблице telegram_files
+FILE_ID_CACHE_ROWS = int(os.getenv("FILE_ID_CACHE_ROWS", "50000"))
+
+# Движок рендера графика: "matplotlib" или "pillow" (быстрее и легче)
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "matplotlib")
+
+# Кэш календаря: сколько месяцев (пользователь, месяц) держать в памяти
+CALENDAR_CACHE_SIZE = int(os.getenv("CALENDAR_CACHE_SIZE", "10000"))
+
+# Выгрузка записей /export: страница чтения, параллельность и порог, после которого файл уходит на диск
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_MAX_CONCURRENCY = int(os.getenv("EXPORT_MAX_CONCURRENCY", "2"))
+EXPORT_QUEUE_SIZE = int(os.getenv("EXPORT_QUEUE_SIZE", "4"))
+EXPORT_SPOOL_BYTES = int(os.getenv("EXPORT_SPOOL_BYTES", str(1024 * 1024)))
+
+# Сколько точек максимум попадает на график после прореживания длинных периодов
+GRAPH_MAX_POINTS = int(os.getenv("GRAPH_MAX_POINTS", "60"))
+
+# Рассылка напоминаний: глобальный лимит Telegram ~30 сообщений/с
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "28"))
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "16"))
+BROADCAST_MAX_RETRIES = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+
+# Свой Bot API сервер (local bot-api или заглушка для тестов), по умолчанию api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Реестр пользователей: как часто сбрасывать накопленные изменения в БД (секунды)
+REGISTRY_FLUSH_INTERVAL = float(os.getenv("REGISTRY_FLUSH_INTERVAL", "5"))
+REGISTRY_BATCH_SIZE = int(os.getenv("REGISTRY_BATCH_SIZE", "1000"))
+
+# Напоминания, просроченные дольше этого окна (например, пока бот лежал), не досылаются
+REMINDER_GRACE_MINUTES = int(os.getenv("REMINDER_GRACE_MINUTES", "10"))
+
+# Кэш проверки подписки на канал (секунды): подписанных помним дольше, чем неподписанных
+SUBSCRIPTION_TTL = float(os.getenv("SUBSCRIPTION_TTL", "600"))
+SUBSCRIPTION_NEGATIVE_TTL = float(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "30"))
+
+# Снимки базы: каталог, сколько хранить, как часто снимать (часы, 0 — не снимать по расписанию),
+# шаг backup API в страницах и максимальный размер части при отправке (лимит Bot API — 50 МБ)
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(BASE_DIR, "snapshots"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "7"))
+SNAPSHOT_INTERVAL_HOURS = float(os.getenv("SNAPSHOT_INTERVAL_HOURS", "24"))
+SNAPSHOT_PAGES = int(os.getenv("SNAPSHOT_PAGES", "1024"))
+SNAPSHOT_PART_BYTES = int(os.getenv("SNAPSHOT_PART_BYTES", str(49 * 1024 * 1024)))
+
+# /stats: как часто пересчитывать (секунды), за сколько дней показывать дни и распределение настроений;
+# запись считается ответом на напоминание, если сделана в течение REMINDER_CONVERSION_HOURS после него
+STATS_REFRESH_INTERVAL = float(os.getenv("STATS_REFRESH_INTERVAL", "300"))
+STATS_DAYS = int(os.getenv("STATS_DAYS", "7"))
+STATS_MOOD_DAYS = int(os.getenv("STATS_MOOD_DAYS", "30"))
+REMINDER_CONVERSION_HOURS = float(os.getenv("REMINDER_CONVERSION_HOURS", "3"))
+
+# Метрики в формате Prometheus: локальный адрес для сборщика, порт 0 — не поднимать сервер
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9464"))
+
+# Замена базы через /upload_db: сколько ждать завершения начатых обработчиков (секунды)
+DB_SWAP_TIMEOUT = float(os.getenv("DB_SWAP_TIMEOUT", "15"))
+
+# Режим получения апдейтов: "polling" или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный адрес, например https://bot.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", os.getenv("PORT", "8080")))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "32"))
+
+# Хранилище FSM: отдельный SQLite-файл, кэш в памяти и пакетная запись (только для одного процесса)
+FSM_DATABASE_PATH = os.getenv("FSM_DATABASE_PATH", os.path.join(BASE_DIR, "fsm_state.db"))
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", str(24 * 3600)))
+FSM_CACHE_SIZE = int(os.getenv("FSM_CACHE_SIZE", "10000"))
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "0.5"))
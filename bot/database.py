@@ -1,16 +1,147 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
 
 from config import DATABASE_URL
+from metrics import instrument_engine
+
+
+def _to_async_url(url: str) -> str:
+    """Переводит sync-URL SQLite на драйвер aiosqlite"""
+    if url.startswith("sqlite:///"):
+        return url.replace("sqlite:///", "sqlite+aiosqlite:///", 1)
+    return url
+
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ASYNC_DATABASE_URL = _to_async_url(DATABASE_URL)
+
+engine = create_async_engine(ASYNC_DATABASE_URL, pool_pre_ping=True)
+_session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
 Base = declarative_base()
+instrument_engine(engine.sync_engine)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: читатели не ждут писателя, busy_timeout: писатели ждут друг друга, а не падают
+    if not ASYNC_DATABASE_URL.startswith("sqlite"):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+
+_inside_gate: ContextVar[bool] = ContextVar("inside_db_gate", default=False)
+
+
+class DatabaseGate:
+    """Пропуск к базе на время замены файла.
+
+    Каждая сессия async_session работает внутри shared(); exclusive()
+    закрывает вход для новых, дожидается, пока закончат уже начатые, и на
+    время замены держит остальных в ожидании — они продолжат с новой базой,
+    а не упадут на полузаписанном файле. Вложенные shared() и задача,
+    закрывшая пропуск, проходят без ожидания.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self._active = 0
+        self._closed = False
+
+    @asynccontextmanager
+    async def shared(self):
+        if _inside_gate.get():
+            yield
+            return
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._closed)
+            self._active += 1
+        token = _inside_gate.set(True)
+        try:
+            yield
+        finally:
+            _inside_gate.reset(token)
+            async with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def exclusive(self, timeout: float):
+        # Если вызывающий сам внутри shared(), его обращение не ждём
+        own = 1 if _inside_gate.get() else 0
+        async with self._condition:
+            if self._closed:
+                raise RuntimeError("database gate is already closed")
+            self._closed = True
+            try:
+                await asyncio.wait_for(self._condition.wait_for(lambda: self._active <= own), timeout)
+            except BaseException:
+                self._closed = False
+                self._condition.notify_all()
+                raise
+        token = _inside_gate.set(True)
+        try:
+            yield
+        finally:
+            _inside_gate.reset(token)
+            async with self._condition:
+                self._closed = False
+                self._condition.notify_all()
+
+
+db_gate = DatabaseGate()
+
+
+@asynccontextmanager
+async def async_session() -> AsyncIterator[AsyncSession]:
+    """Сессия внутри db_gate.shared(): пропуск держится, пока открыта сессия.
+
+    Сетевые вызовы обработчиков (Mistral, отправка файлов) идут вне сессии,
+    так что замена базы ждёт только уже начатые запросы — миллисекунды.
+    """
+    async with db_gate.shared(), _session_factory() as session:
+        yield session
+
+
+def _sync_schema(conn):
+    """Докатывает в уже существующие таблицы новые колонки и индексы моделей.
+
+    create_all создаёт только отсутствующие таблицы; колонки, добавленные в
+    модели позже, должны быть nullable — SQLite умеет добавлять их через
+    ALTER TABLE без пересборки таблицы.
+    """
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+async def init_db():
+    import models  # noqa: F401 — регистрирует таблицы в Base.metadata
+    from migrations import run_migrations, seed_moods
+    from search import ensure_search_index
+
+    async with engine.begin() as conn:
+        await conn.run_sync(run_migrations)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_sync_schema)
+        await conn.run_sync(seed_moods)
+        await conn.run_sync(ensure_search_index)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with async_session() as db:
         yield db
-    finally:
-        db.close()
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+
+from config import DATABASE_PATH, DB_SWAP_TIMEOUT
+from database import db_gate, engine, init_db
+
+logger = logging.getLogger(__name__)
+
+# Без этих колонок база не похожа на базу бота; остальное докатят миграции
+REQUIRED_COLUMNS = {
+    "mood_entries": {"id", "user_id", "text", "created_at"},
+}
+# Настроение в записи: код (текущая схема) или подпись (до миграции)
+MOOD_COLUMNS = {"mood_code", "mood"}
+
+
+class InvalidDatabase(Exception):
+    """Загруженный файл — не целая база бота"""
+
+
+@dataclass
+class SwapResult:
+    entries: int
+    size: int
+    validate_seconds: float
+    swap_seconds: float
+
+
+def validate_database(path: str) -> int:
+    """integrity_check и проверка схемы; возвращает число записей настроения.
+
+    Синхронная — вызывается в потоке, чтобы проверка большого файла не
+    останавливала цикл событий.
+    """
+    try:
+        conn = sqlite3.connect(path)
+        try:
+            problems = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+            if problems != ["ok"]:
+                raise InvalidDatabase("integrity_check: " + "; ".join(problems[:5]))
+
+            for table, required in REQUIRED_COLUMNS.items():
+                columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                if not columns:
+                    raise InvalidDatabase(f"нет таблицы {table}")
+                missing = required - columns
+                if missing:
+                    raise InvalidDatabase(f"в {table} нет колонок: {', '.join(sorted(missing))}")
+                if table == "mood_entries" and not columns & MOOD_COLUMNS:
+                    raise InvalidDatabase("в mood_entries нет колонки настроения")
+
+            return conn.execute("SELECT count(*) FROM mood_entries").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.DatabaseError as e:
+        raise InvalidDatabase(str(e)) from e
+
+
+def _remove_journal(path: str):
+    """Файлы WAL относятся к старой базе: рядом с новой их быть не должно"""
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def _checkpoint(path: str):
+    if os.path.exists(path):
+        conn = sqlite3.connect(path)
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+    _remove_journal(path)
+
+
+async def _reopen():
+    # Пул пересоздаётся лениво: следующее обращение откроет соединение к новому файлу
+    from calendar_cache import calendar_cache
+    from graph_cache import graph_cache
+    from reminders import backfill_next_fire
+    from rollup import backfill_local_dates, backfill_daily_mood
+
+    await init_db()
+    await backfill_next_fire()
+    await backfill_local_dates()
+    await backfill_daily_mood()
+    calendar_cache.clear()
+    await graph_cache.clear()
+
+
+async def swap_database(new_path: str, database_path: str = DATABASE_PATH, timeout: float = DB_SWAP_TIMEOUT) -> SwapResult:
+    """Проверяет ``new_path`` и атомарно ставит его на место базы.
+
+    Старый файл остаётся рядом как ``<база>.backup``. Если новая база не
+    поднялась (миграции, индексы), возвращается старая.
+    """
+    database_path = os.path.abspath(database_path)
+    backup_path = f"{database_path}.backup"
+
+    started = time.monotonic()
+    entries = await asyncio.to_thread(validate_database, new_path)
+    validate_seconds = time.monotonic() - started
+
+    started = time.monotonic()
+    async with db_gate.exclusive(timeout):
+        await engine.dispose()
+        await asyncio.to_thread(_checkpoint, database_path)
+        if os.path.exists(database_path):
+            os.replace(database_path, backup_path)
+        os.replace(new_path, database_path)
+        try:
+            await _reopen()
+        except Exception:
+            logger.error("Uploaded database failed to initialize, restoring previous one", exc_info=True)
+            await engine.dispose()
+            if os.path.exists(backup_path):
+                _remove_journal(database_path)
+                os.replace(backup_path, database_path)
+            await _reopen()
+            raise
+    swap_seconds = time.monotonic() - started
+
+    result = SwapResult(entries, os.path.getsize(database_path), validate_seconds, swap_seconds)
+    logger.info(
+        f"Database swapped: {entries} entries, {result.size} bytes, "
+        f"validated in {validate_seconds:.2f}s, swapped in {swap_seconds:.2f}s"
+    )
+    return result
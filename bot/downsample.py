@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import List, Sequence
+
+from graph_service import GraphPoint
+
+
+def lttb(points: Sequence[GraphPoint], threshold: int) -> List[GraphPoint]:
+    """Largest-Triangle-Three-Buckets: прореживает ряд до ``threshold`` точек.
+
+    Первая и последняя точки сохраняются, из каждой промежуточной корзины
+    берётся точка, образующая наибольший треугольник с уже выбранной
+    предыдущей и средним следующей корзины — так пики и провалы не теряются,
+    а форма кривой остаётся узнаваемой.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    xs = [date.timestamp() if isinstance(date, datetime) else float(date) for date, _ in points]
+    ys = [value for _, value in points]
+
+    sampled = [points[0]]
+    bucket_size = (len(points) - 2) / (threshold - 2)
+    a = 0
+
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, len(points))
+        if next_start >= next_end:
+            next_start, next_end = len(points) - 1, len(points)
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
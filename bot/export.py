@@ -0,0 +1,182 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+import logging
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Set
+
+from aiogram.types.input_file import InputFile
+from sqlalchemy import select, tuple_
+
+from config import EXPORT_BATCH_SIZE, EXPORT_MAX_CONCURRENCY, EXPORT_QUEUE_SIZE, EXPORT_SPOOL_BYTES
+from database import async_session
+from metrics import registry
+from models import MoodEntry
+from moods import MOODS
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {"csv": "csv", "json": "jsonl"}
+EXPORT_COLUMNS = ["id", "created_at", "local_date", "mood_code", "mood", "text"]
+
+
+class ExportBusy(Exception):
+    """Слишком много выгрузок одновременно — запрос отклонён"""
+
+
+class ExportInProgress(Exception):
+    """У пользователя уже идёт выгрузка"""
+
+
+@dataclass
+class ExportResult:
+    file: "SpooledInputFile"
+    entries: int
+    size: int
+    duration: float
+
+
+class SpooledInputFile(InputFile):
+    """Отправка временного файла кусками, без чтения целиком в память"""
+
+    def __init__(self, file, filename: str):
+        super().__init__(filename=filename)
+        self.file = file
+
+    async def read(self, bot):
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+    def close(self):
+        self.file.close()
+
+
+async def iter_entries(user_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[List]:
+    """Записи пользователя по времени, страницами по ключу (created_at, id).
+
+    Ключ совпадает с индексом (user_id, created_at), поэтому каждая
+    страница — поиск по индексу без сортировки всей истории. Страница
+    читается своей короткой сессией, чтобы долгая выгрузка не держала
+    открытой транзакцию чтения.
+    """
+    stmt = (
+        select(MoodEntry.id, MoodEntry.created_at, MoodEntry.local_date, MoodEntry.mood_code, MoodEntry.text)
+        .where(MoodEntry.user_id == user_id)
+        .order_by(MoodEntry.created_at, MoodEntry.id)
+        .limit(batch_size)
+    )
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(tuple_(MoodEntry.created_at, MoodEntry.id) > last)
+        async with async_session() as db:
+            rows = (await db.execute(page)).all()
+        if not rows:
+            return
+        yield rows
+        last = (rows[-1].created_at, rows[-1].id)
+
+
+def _record(row) -> list:
+    emoji, name = MOODS.get(row.mood_code, ("", ""))
+    return [
+        row.id,
+        row.created_at.isoformat(timespec="seconds") if row.created_at else "",
+        row.local_date.isoformat() if row.local_date else "",
+        row.mood_code,
+        f"{emoji} {name}".strip(),
+        row.text,
+    ]
+
+
+def encode_csv(rows, header: bool) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(_record(row) for row in rows)
+    # BOM в начале файла — чтобы Excel открыл кириллицу как UTF-8
+    return (("\ufeff" if header else "") + buffer.getvalue()).encode("utf-8")
+
+
+def encode_jsonl(rows, header: bool) -> bytes:
+    lines = (json.dumps(dict(zip(EXPORT_COLUMNS, _record(row))), ensure_ascii=False) for row in rows)
+    return "".join(line + "\n" for line in lines).encode("utf-8")
+
+
+ENCODERS = {"csv": encode_csv, "json": encode_jsonl}
+
+
+class Exporter:
+    """Выгрузка записей пользователя в файл с ограничением параллельности.
+
+    Одновременно идёт не больше ``max_concurrency`` выгрузок, ещё
+    ``max_queue`` ждут; остальные сразу получают ExportBusy. Каждая страница
+    кодируется и сжимается в потоке, так что цикл событий не занят на
+    время сжатия, а в памяти держится только одна страница.
+    """
+
+    def __init__(self, max_concurrency: int = EXPORT_MAX_CONCURRENCY, max_queue: int = EXPORT_QUEUE_SIZE):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pending = 0
+        self._users: Set[int] = set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def export(self, user_id: int, fmt: str = "csv", compress: bool = False) -> Optional[ExportResult]:
+        """Файл с записями пользователя или None, если записей нет"""
+        if user_id in self._users:
+            raise ExportInProgress(f"user {user_id} export already running")
+        if self._pending >= self.max_concurrency + self.max_queue:
+            raise ExportBusy(f"{self._pending} exports in flight")
+
+        self._pending += 1
+        self._users.add(user_id)
+        try:
+            async with self._semaphore:
+                return await self._export(user_id, fmt, compress)
+        finally:
+            self._pending -= 1
+            self._users.discard(user_id)
+
+    async def _export(self, user_id: int, fmt: str, compress: bool) -> Optional[ExportResult]:
+        started = time.monotonic()
+        encode = ENCODERS[fmt]
+        spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+        sink = gzip.GzipFile(fileobj=spool, mode="wb", compresslevel=6) if compress else spool
+
+        def write(rows, header: bool):
+            sink.write(encode(rows, header))
+
+        entries = 0
+        try:
+            async for rows in iter_entries(user_id):
+                await asyncio.to_thread(write, rows, entries == 0)
+                entries += len(rows)
+            if compress:
+                await asyncio.to_thread(sink.close)
+        except BaseException:
+            spool.close()
+            raise
+
+        if not entries:
+            spool.close()
+            return None
+
+        size = spool.tell()
+        filename = f"mood_diary_{user_id}.{EXPORT_FORMATS[fmt]}" + (".gz" if compress else "")
+        duration = time.monotonic() - started
+        logger.info(f"Exported {entries} entries of user {user_id} ({fmt}, {size} bytes) in {duration:.2f}s")
+        return ExportResult(SpooledInputFile(spool, filename), entries, size, duration)
+
+
+exporter = Exporter()
+registry.gauge("bot_export_pending", "Выгрузки /export в работе и в очереди", lambda: exporter.pending)
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
+
+from sqlalchemy import delete, select
+
+from config import FILE_ID_CACHE_ROWS
+from database import async_session
+from models import TelegramFile
+
+logger = logging.getLogger(__name__)
+
+# Горячие file_id держим в памяти, источник истины — таблица telegram_files
+MEMORY_LIMIT = 10_000
+_file_ids: "OrderedDict[str, str]" = OrderedDict()
+
+# Таблица обрезается до FILE_ID_CACHE_ROWS не на каждой вставке, а раз в столько новых file_id.
+# file_id ищется по sha256 PNG: график с новыми точками — другие байты, поэтому
+# старые file_id почти никогда не совпадают снова и их можно выбрасывать по возрасту
+PRUNE_EVERY = 100
+_inserts_since_prune = 0
+
+
+def _remember_in_memory(digest: str, file_id: str):
+    _file_ids[digest] = file_id
+    _file_ids.move_to_end(digest)
+    if len(_file_ids) > MEMORY_LIMIT:
+        _file_ids.popitem(last=False)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+async def get_file_id(digest: str) -> Optional[str]:
+    file_id = _file_ids.get(digest)
+    if file_id is not None:
+        _file_ids.move_to_end(digest)
+        return file_id
+
+    async with async_session() as db:
+        row = await db.get(TelegramFile, digest)
+    if row is None:
+        return None
+
+    _remember_in_memory(digest, row.file_id)
+    return row.file_id
+
+
+async def remember_file_id(digest: str, file_id: str, kind: str):
+    global _inserts_since_prune
+    _remember_in_memory(digest, file_id)
+    async with async_session() as db:
+        await db.merge(TelegramFile(content_hash=digest, file_id=file_id, kind=kind))
+        await db.commit()
+
+    _inserts_since_prune += 1
+    if _inserts_since_prune >= PRUNE_EVERY:
+        _inserts_since_prune = 0
+        await prune_file_ids()
+
+
+async def prune_file_ids(keep: int = FILE_ID_CACHE_ROWS) -> int:
+    """Оставляет в telegram_files только ``keep`` самых свежих file_id"""
+    stale = select(TelegramFile.content_hash).order_by(TelegramFile.created_at.desc()).offset(keep)
+    async with async_session() as db:
+        result = await db.execute(delete(TelegramFile).where(TelegramFile.content_hash.in_(stale)))
+        await db.commit()
+    if result.rowcount:
+        logger.info(f"Pruned {result.rowcount} old file_id records")
+    return result.rowcount
+
+
+async def forget_file_id(digest: str):
+    _file_ids.pop(digest, None)
+    async with async_session() as db:
+        row = await db.get(TelegramFile, digest)
+        if row is not None:
+            await db.delete(row)
+            await db.commit()
+
+
+async def send_photo_cached(
+    bot: Bot,
+    chat_id: int,
+    data: bytes,
+    filename: str,
+    kind: str,
+    **kwargs,
+) -> Message:
+    """Отправляет картинку по file_id, если такие же байты уже загружались.
+
+    При первой отправке загружает PNG и запоминает file_id, который вернул
+    Telegram, под sha256 содержимого.
+    """
+    digest = content_hash(data)
+
+    file_id = await get_file_id(digest)
+    if file_id is not None:
+        try:
+            return await bot.send_photo(chat_id=chat_id, photo=file_id, **kwargs)
+        except TelegramBadRequest as e:
+            logger.warning(f"Cached file_id for {kind} {digest[:12]} rejected: {e}")
+            await forget_file_id(digest)
+
+    sent = await bot.send_photo(
+        chat_id=chat_id,
+        photo=BufferedInputFile(data, filename=filename),
+        **kwargs,
+    )
+    if sent.photo:
+        await remember_file_id(digest, sent.photo[-1].file_id, kind)
+    return sent
@@ -0,0 +1,214 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import Column, Float, LargeBinary, MetaData, String, Table, delete, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import FSM_DATABASE_PATH, FSM_STATE_TTL, FSM_CACHE_SIZE, FSM_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+fsm_states = Table(
+    "fsm_states",
+    metadata,
+    Column("key", String, primary_key=True),
+    Column("state", String, nullable=True),
+    Column("data", LargeBinary, nullable=True),
+    Column("expires_at", Float, nullable=False, index=True),
+)
+
+# (состояние, данные, время истечения по time.time())
+Record = Tuple[Optional[str], Dict[str, Any], float]
+
+
+def encode_data(data: Mapping[str, Any]) -> Optional[bytes]:
+    """Компактный JSON без пробелов и \\u-экранирования: {"mood":"😄 Отличное"} — 24 байта"""
+    if not data:
+        return None
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def decode_data(raw: Optional[bytes]) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    return json.loads(raw)
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM-хранилище aiogram поверх SQLite.
+
+    Чтения обслуживает ограниченный LRU в памяти, изменения сразу видны в
+    нём и раз в FSM_FLUSH_INTERVAL пачкой уходят в БД. Каждая запись живёт
+    FSM_STATE_TTL с последнего изменения — брошенные сценарии истекают и
+    периодически вычищаются. Пустые состояния в БД не хранятся.
+
+    Хранилище рассчитано на один процесс: кэш считается источником правды
+    и в БД за записью не возвращается, а запись уходит с задержкой пакета.
+    Файл переживает перезапуск, но делить его между процессами нельзя.
+    """
+
+    def __init__(
+        self,
+        path: str = FSM_DATABASE_PATH,
+        ttl: float = FSM_STATE_TTL,
+        cache_size: int = FSM_CACHE_SIZE,
+        flush_interval: float = FSM_FLUSH_INTERVAL,
+    ):
+        self.engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.flush_interval = flush_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self._cache: "OrderedDict[str, Record]" = OrderedDict()
+        self._dirty: Dict[str, Record] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        self._initialized = False
+        self._closed = False
+        self._last_purge = time.monotonic()
+
+    async def _init(self):
+        if self._initialized:
+            return
+        async with self.engine.begin() as conn:
+            await conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+            await conn.run_sync(metadata.create_all)
+        self._initialized = True
+        if not self._closed:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def _remember(self, key: str, record: Record):
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            oldest = next(iter(self._cache))
+            # Несброшенное не вытесняем: иначе следующее чтение вернёт старое из БД
+            if oldest in self._dirty:
+                break
+            self._cache.popitem(last=False)
+
+    async def _load(self, key: str) -> Record:
+        record = self._cache.get(key)
+        now = time.time()
+        if record is not None:
+            if record[2] > now:
+                self._cache.move_to_end(key)
+                return record
+            record = (None, {}, 0.0)
+            self._remember(key, record)
+            return record
+
+        await self._init()
+        async with self.engine.connect() as conn:
+            row = (
+                await conn.execute(
+                    select(fsm_states.c.state, fsm_states.c.data, fsm_states.c.expires_at)
+                    .where(fsm_states.c.key == key)
+                )
+            ).first()
+
+        if row is None or row.expires_at <= now:
+            record = (None, {}, 0.0)
+        else:
+            record = (row.state, decode_data(row.data), row.expires_at)
+        self._remember(key, record)
+        return record
+
+    def _store(self, key: str, state: Optional[str], data: Dict[str, Any]):
+        record = (state, data, time.time() + self.ttl)
+        self._remember(key, record)
+        self._dirty[key] = record
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state_name = state.state if isinstance(state, State) else state
+        storage_key = self.key_builder.build(key)
+        _, data, _ = await self._load(storage_key)
+        self._store(storage_key, state_name, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = self.key_builder.build(key)
+        state, _, _ = await self._load(storage_key)
+        self._store(storage_key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data, _ = await self._load(self.key_builder.build(key))
+        return dict(data)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, {}
+
+            upserts = []
+            deletes = []
+            for key, (state, data, expires_at) in dirty.items():
+                if state is None and not data:
+                    deletes.append(key)
+                else:
+                    upserts.append({
+                        "key": key,
+                        "state": state,
+                        "data": encode_data(data),
+                        "expires_at": expires_at,
+                    })
+
+            try:
+                await self._init()
+                async with self.engine.begin() as conn:
+                    if upserts:
+                        stmt = insert(fsm_states)
+                        stmt = stmt.on_conflict_do_update(
+                            index_elements=[fsm_states.c.key],
+                            set_={
+                                "state": stmt.excluded.state,
+                                "data": stmt.excluded.data,
+                                "expires_at": stmt.excluded.expires_at,
+                            },
+                        )
+                        await conn.execute(stmt, upserts)
+                    if deletes:
+                        await conn.execute(delete(fsm_states).where(fsm_states.c.key.in_(deletes)))
+            except Exception as e:
+                logger.error(f"Failed to flush {len(dirty)} FSM records: {e}")
+                for key, record in dirty.items():
+                    self._dirty.setdefault(key, record)
+
+    async def purge_expired(self):
+        await self._init()
+        async with self.engine.begin() as conn:
+            result = await conn.execute(delete(fsm_states).where(fsm_states.c.expires_at <= time.time()))
+        if result.rowcount:
+            logger.info(f"Purged {result.rowcount} expired FSM records")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if time.monotonic() - self._last_purge > 3600:
+                self._last_purge = time.monotonic()
+                try:
+                    await self.purge_expired()
+                except Exception as e:
+                    logger.error(f"Failed to purge expired FSM records: {e}")
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await self.engine.dispose()
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Set
+
+from config import GRAPH_CACHE_MAX_BYTES, GRAPH_CACHE_DIR, GRAPH_CACHE_DISK_MAX_BYTES, GRAPH_CACHE_DISK_MAX_AGE_DAYS
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Каталог на диске обходится не на каждой записи, а раз в столько новых файлов
+DISK_PRUNE_EVERY = 200
+
+
+def graph_cache_key(user_id: int, probe: str) -> str:
+    """Ключ — по дешёвому зонду (последняя запись, день, период, движок), а не по точкам.
+
+    Точки не нужно загружать, чтобы найти готовый PNG. Старые ключи после
+    новой записи больше не совпадут — invalidate() лишь освобождает их место.
+    """
+    raw = f"{user_id}:{probe}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class GraphCache:
+    """Двухуровневый кэш PNG: LRU в памяти с бюджетом в байтах и каталог на диске.
+
+    Каталог тоже ограничен: файлы старше disk_max_age и самые давно
+    использованные сверх disk_max_bytes периодически удаляются (время
+    использования — mtime, чтение из кэша его обновляет).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = GRAPH_CACHE_MAX_BYTES,
+        disk_dir: str = GRAPH_CACHE_DIR,
+        disk_max_bytes: int = GRAPH_CACHE_DISK_MAX_BYTES,
+        disk_max_age: float = GRAPH_CACHE_DISK_MAX_AGE_DAYS * 86400,
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_max_age = disk_max_age
+        self._disk_writes = 0
+        self._items: "OrderedDict[str, bytes]" = OrderedDict()
+        self._owners: Dict[str, int] = {}
+        self._user_keys: Dict[int, Set[str]] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _disk_path(self, user_id: int, key: str) -> str:
+        return os.path.join(self.disk_dir, str(user_id), f"{key}.png")
+
+    def _remember(self, user_id: int, key: str, data: bytes):
+        if key in self._items:
+            self._items.move_to_end(key)
+            return
+        if len(data) > self.max_bytes:
+            return
+        self._items[key] = data
+        self._owners[key] = user_id
+        self._user_keys.setdefault(user_id, set()).add(key)
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            self._forget(next(iter(self._items)))
+
+    def _forget(self, key: str):
+        data = self._items.pop(key)
+        self._size -= len(data)
+        user_id = self._owners.pop(key)
+        keys = self._user_keys.get(user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[user_id]
+
+    async def get(self, user_id: int, key: str) -> Optional[bytes]:
+        data = self._items.get(key)
+        if data is not None:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return data
+
+        if self.disk_dir:
+            path = self._disk_path(user_id, key)
+            try:
+                data = await asyncio.to_thread(_read_file, path)
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                self._remember(user_id, key, data)
+                self.hits += 1
+                return data
+
+        self.misses += 1
+        return None
+
+    async def put(self, user_id: int, key: str, data: bytes):
+        self._remember(user_id, key, data)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(_write_file, self._disk_path(user_id, key), data)
+            except OSError as e:
+                logger.warning(f"Could not write graph cache file for user {user_id}: {e}")
+                return
+            self._disk_writes += 1
+            if self._disk_writes >= DISK_PRUNE_EVERY:
+                self._disk_writes = 0
+                await self.prune_disk()
+
+    async def prune_disk(self) -> int:
+        if not self.disk_dir:
+            return 0
+        try:
+            removed = await asyncio.to_thread(_prune_dir, self.disk_dir, self.disk_max_bytes, self.disk_max_age)
+        except OSError as e:
+            logger.warning(f"Could not prune graph cache directory: {e}")
+            return 0
+        if removed:
+            logger.info(f"Pruned {removed} graph cache files")
+        return removed
+
+    async def invalidate(self, user_id: int):
+        for key in list(self._user_keys.get(user_id, ())):
+            self._forget(key)
+        if self.disk_dir:
+            await asyncio.to_thread(
+                shutil.rmtree, os.path.join(self.disk_dir, str(user_id)), True
+            )
+
+    async def clear(self):
+        """После замены базы или пересчёта агрегатов: те же ключи могут означать другие точки"""
+        self._items.clear()
+        self._owners.clear()
+        self._user_keys.clear()
+        self._size = 0
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for entry in os.scandir(self.disk_dir):
+                if entry.is_dir():
+                    await asyncio.to_thread(shutil.rmtree, entry.path, True)
+
+    @property
+    def size_bytes(self) -> int:
+        return self._size
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    # mtime — время последнего использования, по нему обрезается каталог
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def _write_file(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _prune_dir(root: str, max_bytes: int, max_age: float) -> int:
+    """Удаляет файлы старше max_age, затем давно использованные, пока каталог больше max_bytes"""
+    files = []
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    expire_before = time.time() - max_age
+    removed = 0
+    for mtime, size, path in files:
+        if mtime >= expire_before and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+
+    # Каталоги пользователей, оставшиеся пустыми
+    for entry in os.scandir(root):
+        if entry.is_dir():
+            try:
+                os.rmdir(entry.path)
+            except OSError:
+                pass
+    return removed
+
+
+graph_cache = GraphCache()
+registry.gauge("bot_graph_cache_hits_total", "Графики, отданные из кэша", lambda: graph_cache.hits, kind="counter")
+registry.gauge("bot_graph_cache_misses_total", "Графики, которые пришлось рисовать", lambda: graph_cache.misses, kind="counter")
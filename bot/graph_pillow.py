@@ -0,0 +1,192 @@
+import io
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from PIL import Image, ImageDraw, ImageFont
+
+from graph_service import GraphPoint, MOOD_LABELS, MOOD_COLORS, tick_spacing
+from image_generator import get_font_paths
+
+# Размеры совпадают с matplotlib-фигурой 12x6 при dpi=100
+WIDTH, HEIGHT = 1200, 600
+# Рисуем в увеличенном масштабе и уменьшаем — так линии и круги сглаживаются
+SCALE = 2
+
+BG_COLOR = "#FAFAFA"
+LINE_COLOR = "#4CAF50"
+GRID_COLOR = "#EAEAEA"
+# Заливка alpha=0.15 цветом линии поверх фона, смешанная заранее
+FILL_COLOR = "#E0EFE0"
+SPINE_COLOR = "#E0E0E0"
+TICK_COLOR = "#616161"
+
+MARGIN_LEFT = 70
+MARGIN_RIGHT = 20
+MARGIN_TOP = 20
+MARGIN_BOTTOM = 70
+
+Y_MIN, Y_MAX = 0.5, 5.5
+
+EMOJI_FONT_PATHS = [
+    "/usr/share/fonts/truetype/noto/NotoColorEmoji.ttf",
+    "/usr/share/fonts/noto/NotoColorEmoji.ttf",
+    "/System/Library/Fonts/Apple Color Emoji.ttc",
+]
+
+
+@lru_cache(maxsize=None)
+def _font(size: int) -> ImageFont.FreeTypeFont:
+    for path in get_font_paths():
+        try:
+            return ImageFont.truetype(path, size)
+        except (IOError, OSError):
+            continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=None)
+def _emoji_font() -> Optional[ImageFont.FreeTypeFont]:
+    # Цветные emoji-шрифты растровые и поддерживают только размер 109
+    for path in EMOJI_FONT_PATHS:
+        try:
+            return ImageFont.truetype(path, 109)
+        except (IOError, OSError):
+            continue
+    return None
+
+
+@lru_cache(maxsize=None)
+def _emoji_tile(value: int, size: int) -> Image.Image:
+    label = MOOD_LABELS[value]
+    emoji_font = _emoji_font()
+    if emoji_font is not None:
+        tile = Image.new("RGBA", (136, 128), (0, 0, 0, 0))
+        ImageDraw.Draw(tile).text((0, 0), label, font=emoji_font, embedded_color=True)
+        tile = tile.crop(tile.getbbox() or (0, 0, 136, 128))
+        return tile.resize((size, size), Image.LANCZOS)
+
+    # Без emoji-шрифта рисуем символ обычным шрифтом, как и matplotlib
+    tile = Image.new("RGBA", (size * 2, size * 2), (0, 0, 0, 0))
+    ImageDraw.Draw(tile).text((size, size), label, font=_font(size), fill="#212121", anchor="mm")
+    return tile.crop(tile.getbbox() or (0, 0, size * 2, size * 2))
+
+
+@lru_cache(maxsize=64)
+def _tick_label(text: str, size: int) -> Image.Image:
+    font = _font(size)
+    left, top, right, bottom = font.getbbox(text)
+    label = Image.new("RGBA", (right - left + 2, bottom - top + 2), (0, 0, 0, 0))
+    ImageDraw.Draw(label).text((-left + 1, -top + 1), text, font=font, fill=TICK_COLOR)
+    return label.rotate(45, resample=Image.BICUBIC, expand=True)
+
+
+def _dashed_hline(draw: ImageDraw.ImageDraw, x0: float, x1: float, y: float, width: int):
+    dash, gap = 6 * SCALE, 4 * SCALE
+    x = x0
+    while x < x1:
+        draw.line([(x, y), (min(x + dash, x1), y)], fill=GRID_COLOR, width=width)
+        x += dash + gap
+
+
+def _dashed_vline(draw: ImageDraw.ImageDraw, x: float, y0: float, y1: float, width: int):
+    dash, gap = 6 * SCALE, 4 * SCALE
+    y = y0
+    while y < y1:
+        draw.line([(x, y), (x, min(y + dash, y1))], fill=GRID_COLOR, width=width)
+        y += dash + gap
+
+
+def _day_ticks(start: datetime, end: datetime, interval: int) -> list:
+    day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    if day < start:
+        day += timedelta(days=1)
+    ticks = []
+    while day <= end:
+        ticks.append(day)
+        day += timedelta(days=interval)
+    return ticks
+
+
+def render_mood_graph_pillow(points: Sequence[GraphPoint]) -> bytes:
+    """Тот же график, что и render_mood_graph, но нарисованный напрямую Pillow"""
+    if not points:
+        raise ValueError("No entries to plot")
+
+    s = SCALE
+    image = Image.new("RGB", (WIDTH * s, HEIGHT * s), BG_COLOR)
+    draw = ImageDraw.Draw(image)
+
+    left, top = MARGIN_LEFT * s, MARGIN_TOP * s
+    right, bottom = (WIDTH - MARGIN_RIGHT) * s, (HEIGHT - MARGIN_BOTTOM) * s
+
+    dates = [date for date, _ in points]
+    values = [value for _, value in points]
+
+    # Как у matplotlib: по 5% поля слева и справа от данных
+    start, end = dates[0], dates[-1]
+    span = (end - start).total_seconds()
+    if span == 0:
+        start, end = start - timedelta(days=1), end + timedelta(days=1)
+        span = (end - start).total_seconds()
+    pad = span * 0.05
+    x_start = start - timedelta(seconds=pad)
+    x_span = span + pad * 2
+
+    def x_of(date: datetime) -> float:
+        return left + (date - x_start).total_seconds() / x_span * (right - left)
+
+    def y_of(value: float) -> float:
+        return bottom - (value - Y_MIN) / (Y_MAX - Y_MIN) * (bottom - top)
+
+    coords = [(x_of(d), y_of(v)) for d, v in zip(dates, values)]
+    interval, date_format = tick_spacing(dates[0], dates[-1])
+    ticks = _day_ticks(x_start, x_start + timedelta(seconds=x_span), interval)
+
+    # Заливка под линией: непрозрачный полигон заранее смешанного цвета,
+    # сетка рисуется поверх — без полноразмерного alpha_composite
+    if len(coords) > 1:
+        polygon = coords + [(coords[-1][0], y_of(Y_MIN)), (coords[0][0], y_of(Y_MIN))]
+        draw.polygon(polygon, fill=FILL_COLOR)
+
+    # Сетка
+    for level in MOOD_LABELS:
+        _dashed_hline(draw, left, right, y_of(level), s)
+    for tick in ticks:
+        _dashed_vline(draw, x_of(tick), top, bottom, s)
+
+    # Рамка
+    draw.rectangle([left, top, right, bottom], outline=SPINE_COLOR, width=s)
+
+    # Линия и маркеры
+    if len(coords) > 1:
+        draw.line(coords, fill=LINE_COLOR, width=3 * s, joint="curve")
+
+    outer, inner = 9 * s, 6 * s
+    for (x, y), value in zip(coords, values):
+        color = MOOD_COLORS.get(round(value), "#9E9E9E")
+        draw.ellipse([x - outer, y - outer, x + outer, y + outer],
+                     fill="white", outline=color, width=3 * s)
+        draw.ellipse([x - inner, y - inner, x + inner, y + inner], fill=color)
+
+    # Подписи оси Y (emoji)
+    emoji_size = 22 * s
+    for level in MOOD_LABELS:
+        tile = _emoji_tile(level, emoji_size)
+        y = int(y_of(level) - tile.height / 2)
+        x = int(left - 12 * s - tile.width)
+        image.paste(tile, (x, y), tile)
+
+    # Подписи оси X (даты под углом 45°)
+    for tick in ticks:
+        label = _tick_label(tick.strftime(date_format), 9 * s + 4)
+        x = int(x_of(tick) - label.width)
+        y = int(bottom + 6 * s)
+        image.paste(label, (x, y), label)
+
+    # Усреднение блоков SCALE x SCALE заметно дешевле LANCZOS и даёт то же сглаживание
+    image = image.reduce(SCALE)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=3)
+    return buffer.getvalue()
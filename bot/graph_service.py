@@ -1,35 +1,37 @@
 import io
-from typing import List
+from datetime import datetime
+from typing import Callable, Sequence, Tuple
 
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
+from config import GRAPH_BACKEND
+from moods import MOODS
 
-from models import MoodEntry
+# Код настроения и есть значение на оси Y
+MOOD_LABELS = {code: MOODS[code][0] for code in sorted(MOODS)}
+MOOD_COLORS = {1: "#9C27B0", 2: "#2196F3", 3: "#FFC107", 4: "#4CAF50", 5: "#FF5722"}
 
-MOOD_VALUES = {
-    "😄 Отличное": 5,
-    "🙂 Хорошее": 4,
-    "😐 Нормальное": 3,
-    "😔 Плохое": 2,
-    "😢 Очень плохое": 1,
-}
+GraphPoint = Tuple[datetime, float]
 
-MOOD_LABELS = {1: "😢", 2: "😔", 3: "😐", 4: "🙂", 5: "😄"}
-MOOD_COLORS = {1: "#9C27B0", 2: "#2196F3", 3: "#FFC107", 4: "#4CAF50", 5: "#FF5722"}
+
+def tick_spacing(start: datetime, end: datetime) -> Tuple[int, str]:
+    """Шаг подписей оси X в днях (~8 подписей на график) и их формат"""
+    span_days = (end - start).days
+    date_format = "%d.%m" if span_days <= 366 else "%m.%Y"
+    return max(1, span_days // 8), date_format
 
 
-def generate_mood_graph(entries: List[MoodEntry]) -> io.BytesIO:
-    if not entries:
+def render_mood_graph(points: Sequence[GraphPoint]) -> bytes:
+    """Строит PNG графика. Чистая CPU-функция, выполняется в процессе рендера"""
+    if not points:
         raise ValueError("No entries to plot")
 
-    dates = []
-    values = []
+    # matplotlib импортируется лениво: при GRAPH_BACKEND=pillow он не нужен вовсе
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
 
-    for entry in entries:
-        dates.append(entry.created_at)
-        values.append(MOOD_VALUES.get(entry.mood, 3))
+    dates = [date for date, _ in points]
+    values = [value for _, value in points]
 
     fig, ax = plt.subplots(figsize=(12, 6), dpi=100, facecolor='#FAFAFA')
     ax.set_facecolor('#FAFAFA')
@@ -40,29 +42,20 @@ def generate_mood_graph(entries: List[MoodEntry]) -> io.BytesIO:
                     markerfacecolor='white', markeredgewidth=2,
                     markeredgecolor=line_color, zorder=3)
 
-    for i in range(len(dates) - 1):
-        ax.fill_between(
-            dates[i:i+2],
-            [values[i], values[i+1]],
-            0.5,
-            alpha=0.15,
-            color=line_color,
-            zorder=1
-        )
-
-    for date, value in zip(dates, values):
-        color = MOOD_COLORS.get(value, '#9E9E9E')
-        ax.scatter([date], [value], s=120, c='white',
-                   edgecolors=color, linewidths=2.5, zorder=4)
-        ax.scatter([date], [value], s=60, c=color, zorder=5)
+    ax.fill_between(dates, values, 0.5, alpha=0.15, color=line_color, zorder=1)
+
+    point_colors = [MOOD_COLORS.get(round(value), '#9E9E9E') for value in values]
+    ax.scatter(dates, values, s=120, c='white',
+               edgecolors=point_colors, linewidths=2.5, zorder=4)
+    ax.scatter(dates, values, s=60, c=point_colors, zorder=5)
 
     ax.set_ylim(0.5, 5.5)
     ax.set_yticks([1, 2, 3, 4, 5])
     ax.set_yticklabels([MOOD_LABELS[i] for i in [1, 2, 3, 4, 5]], fontsize=14)
 
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m'))
-    n_dates = max(1, len(dates) // 8)
-    ax.xaxis.set_major_locator(mdates.DayLocator(interval=n_dates))
+    interval, date_format = tick_spacing(dates[0], dates[-1])
+    ax.xaxis.set_major_formatter(mdates.DateFormatter(date_format))
+    ax.xaxis.set_major_locator(mdates.DayLocator(interval=interval))
 
     plt.xticks(rotation=45, ha='right', fontsize=9, color='#616161')
     plt.yticks(fontsize=12)
@@ -79,7 +72,26 @@ def generate_mood_graph(entries: List[MoodEntry]) -> io.BytesIO:
     buffer = io.BytesIO()
     plt.savefig(buffer, format='PNG', dpi=100, bbox_inches='tight',
                 facecolor='#FAFAFA', edgecolor='none')
-    buffer.seek(0)
     plt.close(fig)
 
-    return buffer
+    return buffer.getvalue()
+
+
+def get_graph_renderer(backend: str = GRAPH_BACKEND) -> Callable[[Sequence[GraphPoint]], bytes]:
+    if backend == "pillow":
+        from graph_pillow import render_mood_graph_pillow
+        return render_mood_graph_pillow
+    if backend == "matplotlib":
+        return render_mood_graph
+    raise ValueError(f"Unknown graph backend: {backend}")
+
+
+def warmup(backend: str = GRAPH_BACKEND):
+    """Загружает тяжёлые модули выбранного движка заранее"""
+    if backend == "matplotlib":
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot  # noqa: F401
+    else:
+        get_graph_renderer(backend)
+
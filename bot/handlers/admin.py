@@ -1,12 +1,24 @@
+import asyncio
 import os
 import logging
-import shutil
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.exceptions import TelegramBadRequest
 
-from config import CHANNEL_ID, CHANNEL_USERNAME, DATABASE_PATH
+from config import CHANNEL_ID, CHANNEL_USERNAME, DATABASE_PATH, STATS_DAYS, STATS_MOOD_DAYS
+from db_swap import swap_database, InvalidDatabase
+from subscription_cache import subscription_cache
+from rollup import rebuild_daily_mood
+from search import rebuild_search_index
+from snapshots import snapshot_manager, split_parts
+from stats import stats_service, StatsSnapshot
+from graph_cache import graph_cache
+from calendar_cache import calendar_cache
+from moods import MOODS
+from metrics import (
+    Histogram, UPDATE_SECONDS, UPDATE_ERRORS, DB_QUERY_SECONDS, AI_SECONDS, RENDER_SECONDS, BROADCAST_SEND_SECONDS,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -19,14 +31,17 @@ def is_admin(user_id: int) -> bool:
     return user_id == ADMIN_ID
 
 
+def format_size(size: int) -> str:
+    return f"{size / 1024 / 1024:.1f} МБ"
+
+
 async def is_subscribed(user_id: int, bot) -> bool:
     """Проверяет, подписан ли пользователь на канал"""
     if not CHANNEL_ID:
         return True  # Если канал не настроен, считаем что подписан
 
     try:
-        member = await bot.get_chat_member(CHANNEL_ID, user_id)
-        return member.status in ["member", "administrator", "creator"]
+        return await subscription_cache.is_subscribed(bot, user_id)
     except Exception as e:
         logger.error(f"Error checking subscription: {e}")
         return True  # При ошибке пропускаем
@@ -62,18 +77,148 @@ async def cmd_download_db(message: types.Message):
         return
 
     try:
-        await message.answer("📤 Отправляю базу данных...")
-        with open(db_path, "rb") as db_file:
-            await message.answer_document(
-                document=types.FSInputFile(db_path),
-                caption="🗄️ mood_tracker.db"
-            )
-        logger.info(f"Admin {message.from_user.id} downloaded the database")
+        await message.answer("📸 Снимаю копию базы данных...")
+        snapshot = await snapshot_manager.take()
+        parts = split_parts(snapshot.path)
+        await message.answer(
+            f"🗄️ Снимок готов за {snapshot.duration:.1f} с "
+            f"(копия {snapshot.backup_seconds:.1f} с, сжатие {snapshot.compress_seconds:.1f} с)\n"
+            f"Размер: {format_size(snapshot.db_size)} → {format_size(snapshot.size)}"
+            + (f"\nЧастей: {len(parts)}, собрать: cat {os.path.basename(snapshot.path)}.* > "
+               f"{os.path.basename(snapshot.path)}" if len(parts) > 1 else "")
+        )
+        for part in parts:
+            await message.answer_document(document=part, caption=f"🗄️ {part.filename}")
+        logger.info(f"Admin {message.from_user.id} downloaded the database snapshot {snapshot.path}")
     except Exception as e:
-        logger.error(f"Error sending database: {e}")
+        logger.error(f"Error sending database: {e}", exc_info=True)
         await message.answer(f"❌ Ошибка при отправке: {e}")
 
 
+def hit_rate(hits: int, misses: int) -> str:
+    total = hits + misses
+    return f"{hits}/{total} ({hits / total:.0%})" if total else "—"
+
+
+def format_stats(snapshot: StatsSnapshot) -> str:
+    lines = [
+        "📊 Статистика",
+        "",
+        f"👥 Активных подписчиков: {snapshot.active_users}",
+        f"✍️ Писали за {STATS_MOOD_DAYS} дн.: {snapshot.monthly_users}",
+        "",
+        "📅 По дням (пользователи / записи / среднее):",
+    ]
+    for day in snapshot.days:
+        lines.append(f"{day.day.strftime('%d.%m')}: {day.users} / {day.entries} / {day.average:.2f}")
+
+    total = sum(snapshot.moods.values())
+    if total:
+        lines += ["", f"🎭 Настроения за {STATS_MOOD_DAYS} дн.:"]
+        for code, (emoji, name) in MOODS.items():
+            count = snapshot.moods.get(code, 0)
+            lines.append(f"{emoji} {name}: {count} ({count / total:.0%})")
+
+    sent, converted = snapshot.reminders
+    conversion = f"{snapshot.conversion:.0%}" if snapshot.conversion is not None else "—"
+    lines += ["", f"🔔 Напоминания за {STATS_DAYS} дн.: {sent}, ответили записью: {converted} ({conversion})"]
+
+    subscription = subscription_cache.stats()
+    lines += [
+        "",
+        "🗃 Кэши:",
+        f"подписка: {hit_rate(subscription['hits'], subscription['misses'])}, в памяти {subscription['size']}",
+        f"графики: {hit_rate(graph_cache.hits, graph_cache.misses)}",
+        f"календарь: {hit_rate(calendar_cache.hits, calendar_cache.misses)}",
+        "",
+        f"Обновлено {snapshot.collected_at.strftime('%H:%M:%S')} UTC за {snapshot.duration * 1000:.0f} мс",
+    ]
+    return "\n".join(lines)
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: types.Message):
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для выполнения этой команды")
+        return
+
+    snapshot = stats_service.snapshot
+    if snapshot is None:
+        await message.answer("⏳ Статистика ещё считается, попробуйте через минуту")
+        return
+    await message.answer(format_stats(snapshot))
+
+
+def format_histogram(title: str, histogram: Histogram, limit: int = 8) -> list:
+    rows = histogram.summary()[:limit]
+    if not rows:
+        return []
+    lines = ["", title]
+    for labels, count, total in rows:
+        p95 = histogram.quantile(labels, 0.95)
+        lines.append(
+            f"{' '.join(labels)}: {count} шт., всего {total:.1f} с, "
+            f"среднее {total / count * 1000:.0f} мс, p95 {p95 * 1000:.0f} мс"
+        )
+    return lines
+
+
+def format_metrics() -> str:
+    lines = ["⏱ Метрики с запуска (по суммарному времени)"]
+    lines += format_histogram("Обработчики:", UPDATE_SECONDS)
+    errors = UPDATE_ERRORS.total()
+    if errors:
+        lines.append(f"ошибок: {int(errors)}")
+    lines += format_histogram("SQL:", DB_QUERY_SECONDS)
+    lines += format_histogram("Mistral AI:", AI_SECONDS)
+    lines += format_histogram("Рендер:", RENDER_SECONDS)
+    lines += format_histogram("Рассылка:", BROADCAST_SEND_SECONDS)
+    if len(lines) == 1:
+        lines.append("\nПока ничего не измерено")
+    return "\n".join(lines)
+
+
+@router.message(Command("metrics"))
+async def cmd_metrics(message: types.Message):
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для выполнения этой команды")
+        return
+
+    await message.answer(format_metrics())
+
+
+@router.message(Command("rebuild_daily"))
+async def cmd_rebuild_daily(message: types.Message):
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для выполнения этой команды")
+        return
+
+    await message.answer("🔄 Пересчитываю дневные агрегаты...")
+    try:
+        entries = await rebuild_daily_mood()
+        await message.answer(f"✅ Агрегаты пересчитаны по {entries} записям")
+        logger.info(f"Admin {message.from_user.id} rebuilt daily mood rollup")
+    except Exception as e:
+        logger.error(f"Error rebuilding daily mood rollup: {e}", exc_info=True)
+        await message.answer(f"❌ Ошибка при пересчёте: {e}")
+
+
+@router.message(Command("rebuild_search"))
+async def cmd_rebuild_search(message: types.Message):
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав для выполнения этой команды")
+        return
+
+    await message.answer("🔄 Пересобираю поисковый индекс...")
+    try:
+        duration = await rebuild_search_index()
+        await message.answer(f"✅ Поисковый индекс пересобран за {duration:.1f} с")
+        logger.info(f"Admin {message.from_user.id} rebuilt search index")
+    except Exception as e:
+        logger.error(f"Error rebuilding search index: {e}", exc_info=True)
+        await message.answer(f"❌ Ошибка при пересборке: {e}")
+
+
 @router.message(Command("upload_db"))
 async def cmd_upload_db(message: types.Message):
     if not is_admin(message.from_user.id):
@@ -121,27 +266,38 @@ async def process_db_upload(message: types.Message, document):
     await message.answer("📥 Загружаю базу данных...")
 
     db_path = os.path.abspath(DATABASE_PATH)
-    backup_path = f"{db_path}.backup"
-
-    logger.info(f"Database path: {db_path}")
+    # Рядом с базой, чтобы os.replace был атомарным переименованием в пределах одного диска
+    upload_path = f"{db_path}.upload"
 
     try:
-        if os.path.exists(db_path):
-            shutil.copy2(db_path, backup_path)
-            logger.info("Backup created")
-
         file = await message.bot.get_file(document.file_id)
         logger.info(f"Telegram file path: {file.file_path}")
 
-        await message.bot.download_file(file.file_path, destination=db_path)
-        logger.info(f"File downloaded to {db_path}, size: {os.path.getsize(db_path)} bytes")
+        await message.bot.download_file(file.file_path, destination=upload_path)
+        logger.info(f"File downloaded to {upload_path}, size: {os.path.getsize(upload_path)} bytes")
+
+        await message.answer("🔍 Проверяю файл и заменяю базу...")
+        result = await swap_database(upload_path)
 
-        await message.answer("✅ База данных успешно заменена!\n\n📁 Старая версия сохранена как `mood_tracker.db.backup`", parse_mode="Markdown")
+        await message.answer(
+            "✅ База данных успешно заменена!\n\n"
+            f"Записей: {result.entries}, размер: {format_size(result.size)}\n"
+            f"Проверка {result.validate_seconds:.1f} с, замена {result.swap_seconds:.1f} с\n"
+            "📁 Старая версия сохранена как `mood_tracker.db.backup`",
+            parse_mode="Markdown",
+        )
         logger.info(f"Admin {message.from_user.id} uploaded new database")
 
+    except InvalidDatabase as e:
+        logger.warning(f"Rejected uploaded database: {e}")
+        await message.answer(f"❌ Файл не подходит: {e}\n\nТекущая база не тронута")
+    except asyncio.TimeoutError:
+        logger.warning("Database swap timed out waiting for in-flight handlers")
+        await message.answer("⏳ Бот занят, база не заменена. Попробуйте ещё раз через минуту")
     except Exception as e:
         logger.error(f"Error uploading database: {e}", exc_info=True)
-        if os.path.exists(backup_path):
-            shutil.copy2(backup_path, db_path)
-            logger.info("Restored from backup")
-        await message.answer(f"❌ Ошибка при загрузке: {e}\n\nВосстановлена предыдущая версия")
+        await message.answer(f"❌ Ошибка при загрузке: {e}\n\nТекущая база не изменилась")
+    finally:
+        for path in (upload_path, f"{upload_path}-wal", f"{upload_path}-shm"):
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,33 +1,107 @@
 import logging
-import re
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo
 
 from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
+from aiogram.exceptions import TelegramBadRequest
+from sqlalchemy import select
 
-from database import SessionLocal
+from database import async_session
 from models import MoodEntry
-from config import TIMEZONE
-from keyboards import get_back_keyboard
+from reminders import get_zone
+from rollup import get_user_timezone, local_date, month_marks
+from calendar_cache import calendar_cache
+from keyboards import get_back_keyboard, get_calendar_keyboard, get_day_keyboard
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
-DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
-
-# Таймзона Тюмени (UTC+5)
-USER_TZ = timezone(timedelta(hours=5))
-
 
 class DateState(StatesGroup):
     waiting_for_date = State()
 
 
+async def get_month_marks(user_id: int, year: int, month: int) -> Dict[int, int]:
+    marks = calendar_cache.get(user_id, year, month)
+    if marks is None:
+        async with async_session() as db:
+            marks = await month_marks(db, user_id, year, month)
+        calendar_cache.put(user_id, year, month, marks)
+    return marks
+
+
+async def show_calendar(callback: CallbackQuery, year: int, month: int):
+    marks = await get_month_marks(callback.from_user.id, year, month)
+    text = (
+        "📅 Календарь\n\n"
+        "Дни с записями отмечены настроением — нажми на день, чтобы открыть записи."
+    )
+    keyboard = get_calendar_keyboard(year, month, marks)
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except TelegramBadRequest as e:
+        # Повторное нажатие на тот же месяц — сообщение не изменилось
+        if "message is not modified" not in str(e):
+            await callback.message.answer(text, reply_markup=keyboard)
+
+
 @router.callback_query(F.data == "menu_date")
 async def start_date_lookup(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    async with async_session() as db:
+        today = local_date(datetime.utcnow(), await get_user_timezone(db, callback.from_user.id))
+    await show_calendar(callback, today.year, today.month)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("cal_month:"))
+async def calendar_month(callback: CallbackQuery):
+    try:
+        month_start = datetime.strptime(callback.data.split(":", 1)[1], "%Y-%m")
+    except ValueError:
+        await callback.answer()
+        return
+    await show_calendar(callback, month_start.year, month_start.month)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "cal_noop")
+async def calendar_noop(callback: CallbackQuery):
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("cal_day:"))
+async def calendar_day(callback: CallbackQuery):
+    user_id = callback.from_user.id
+    try:
+        day = datetime.strptime(callback.data.split(":", 1)[1], "%Y-%m-%d").date()
+    except ValueError:
+        await callback.answer()
+        return
+
+    # Отметки месяца уже в кэше — пустые дни отвечаем без запроса к БД
+    marks = await get_month_marks(user_id, day.year, day.month)
+    if day.day not in marks:
+        await callback.answer("За эту дату записей нет")
+        return
+
+    logger.info(f"User {user_id} opened calendar day {day}")
+    entries, zone = await load_day(user_id, day)
+    text = format_day(day.isoformat(), entries, zone)
+    try:
+        await callback.message.edit_text(text, reply_markup=get_day_keyboard(day.year, day.month))
+    except Exception:
+        await callback.message.answer(text, reply_markup=get_day_keyboard(day.year, day.month))
+    await callback.answer()
+
+
+@router.callback_query(F.data == "date_manual")
+async def manual_date_lookup(callback: CallbackQuery, state: FSMContext):
     await state.set_state(DateState.waiting_for_date)
     try:
         await callback.message.edit_text(
@@ -60,6 +134,41 @@ async def process_date_auto(message: Message):
     await handle_date_lookup(message, date_str)
 
 
+async def load_day(user_id: int, day: date) -> Tuple[List[MoodEntry], ZoneInfo]:
+    async with async_session() as db:
+        zone = get_zone(await get_user_timezone(db, user_id))
+        result = await db.scalars(
+            select(MoodEntry)
+            .where(
+                MoodEntry.user_id == user_id,
+                MoodEntry.local_date == day,
+            )
+            .order_by(MoodEntry.created_at.desc())
+        )
+        return list(result), zone
+
+
+def format_day(date_str: str, entries: List[MoodEntry], zone: ZoneInfo) -> str:
+    if not entries:
+        return (
+            f"📅 Запись за {date_str}\n\n"
+            "За эту дату записей нет."
+        )
+
+    # Конвертируем время в часовой пояс пользователя
+    entries_text = []
+    for i, entry in enumerate(entries, 1):
+        local_time = entry.created_at.replace(tzinfo=timezone.utc).astimezone(zone)
+        entries_text.append(
+            f"{'─' * 20}\n"
+            f"📝 Запись #{i}\n\n"
+            f"😊 Настроение: {entry.mood}\n\n"
+            f"📝 Описание:\n{entry.text}\n\n"
+            f"⏰ Время: {local_time.strftime('%H:%M')}"
+        )
+    return f"📅 Записи за {date_str}\n\n" + "\n\n".join(entries_text)
+
+
 async def handle_date_lookup(message: Message, date_str: str):
     user_id = message.from_user.id
     logger.info(f"User {user_id} requested day lookup: {date_str}")
@@ -75,48 +184,9 @@ async def handle_date_lookup(message: Message, date_str: str):
         )
         return
 
-    db = SessionLocal()
-    try:
-        start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = target_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        entries = (
-            db.query(MoodEntry)
-            .filter(
-                MoodEntry.user_id == user_id,
-                MoodEntry.created_at >= start_of_day,
-                MoodEntry.created_at <= end_of_day,
-            )
-            .order_by(MoodEntry.created_at.desc())
-            .all()
-        )
-
-        if entries:
-            logger.info(f"Found {len(entries)} entries for user {user_id} on {date_str}")
-            
-            # Конвертируем время в локальное (Тюмень, UTC+5)
-            entries_text = []
-            for i, entry in enumerate(entries, 1):
-                local_time = entry.created_at.replace(tzinfo=timezone.utc).astimezone(USER_TZ)
-                entries_text.append(
-                    f"{'─' * 20}\n"
-                    f"📝 Запись #{i}\n\n"
-                    f"😊 Настроение: {entry.mood}\n\n"
-                    f"📝 Описание:\n{entry.text}\n\n"
-                    f"⏰ Время: {local_time.strftime('%H:%M')}"
-                )
-            
-            await message.answer(
-                f"📅 Записи за {date_str}\n\n" + "\n\n".join(entries_text),
-                reply_markup=get_back_keyboard(),
-            )
-        else:
-            logger.info(f"No entries found for user {user_id} on {date_str}")
-            await message.answer(
-                f"📅 Запись за {date_str}\n\n"
-                "За эту дату записей нет.",
-                reply_markup=get_back_keyboard(),
-            )
-
-    finally:
-        db.close()
+    entries, zone = await load_day(user_id, target_date.date())
+    if entries:
+        logger.info(f"Found {len(entries)} entries for user {user_id} on {date_str}")
+    else:
+        logger.info(f"No entries found for user {user_id} on {date_str}")
+    await message.answer(format_day(date_str, entries, zone), reply_markup=get_back_keyboard())
@@ -0,0 +1,56 @@
+import logging
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from export import exporter, ExportBusy, ExportInProgress, ENCODERS
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+USAGE = (
+    "📦 Выгрузка записей\n\n"
+    "/export — таблица CSV\n"
+    "/export json — JSON Lines, по записи в строке\n"
+    "Добавь gz, чтобы сжать файл: /export csv gz"
+)
+
+
+@router.message(Command("export"))
+async def cmd_export(message: Message, command: CommandObject):
+    args = (command.args or "").lower().split()
+    fmt = next((arg for arg in args if arg in ENCODERS), "csv")
+    compress = "gz" in args or "gzip" in args
+    if any(arg not in ENCODERS and arg not in ("gz", "gzip") for arg in args):
+        await message.answer(USAGE)
+        return
+
+    user_id = message.from_user.id
+    try:
+        status = await message.answer("📦 Собираю файл с записями...")
+        result = await exporter.export(user_id, fmt, compress)
+    except ExportInProgress:
+        await message.answer("⏳ Выгрузка уже идёт, дождись файла")
+        return
+    except ExportBusy:
+        await message.answer("⏳ Сейчас много выгрузок, попробуй через минуту")
+        return
+    except Exception as e:
+        logger.error(f"Error exporting entries of user {user_id}: {e}", exc_info=True)
+        await message.answer("❌ Не удалось собрать файл, попробуй позже")
+        return
+
+    if result is None:
+        await status.edit_text("📭 Записей пока нет — выгружать нечего")
+        return
+
+    try:
+        await message.answer_document(result.file, caption=f"📦 Записей: {result.entries}")
+        await status.delete()
+    except Exception as e:
+        logger.error(f"Error sending export to user {user_id}: {e}", exc_info=True)
+        await message.answer("❌ Не удалось отправить файл, попробуй позже")
+    finally:
+        result.file.close()
@@ -1,64 +1,161 @@
 import logging
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
 from aiogram import Router, F
-from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, BufferedInputFile
+from aiogram.types import CallbackQuery
+from sqlalchemy import select
 
-from database import SessionLocal
+from database import async_session
 from models import MoodEntry
-from graph_service import generate_mood_graph
-from keyboards import get_back_keyboard
+from rollup import local_date, get_user_timezone, first_day, bucketed_days
+from downsample import lttb
+from graph_service import GraphPoint, get_graph_renderer
+from render_pool import render_pool, RenderPoolBusy
+from graph_cache import graph_cache, graph_cache_key
+from file_id_cache import send_photo_cached
+from keyboards import get_back_keyboard, get_graph_keyboard
+from config import GRAPH_BACKEND, GRAPH_MAX_POINTS
+from metrics import RENDER_SECONDS
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+DEFAULT_PERIOD = "month"
+
+# Длина периода в днях (None — вся история) и подпись к графику
+GRAPH_PERIOD_DAYS = {"week": 7, "month": 30, "year": 365, "all": None}
+GRAPH_CAPTIONS = {
+    "week": "за последние 7 дней",
+    "month": "за последние 30 дней",
+    "year": "за последний год",
+    "all": "за всё время",
+}
+
+
+def choose_bucket(span_days: int) -> str:
+    """Корзина агрегации: дни до квартала, недели до двух лет, дальше месяцы"""
+    if span_days <= 92:
+        return "day"
+    if span_days <= 730:
+        return "week"
+    return "month"
+
+
+async def graph_probe(user_id: int) -> Tuple[date, Optional[int]]:
+    """Сегодня по часам пользователя и id его последней записи — два поиска по индексам.
+
+    Вместе с периодом они и есть ключ кэша: новая запись меняет id, а смена
+    дня сдвигает окно периода. Повторный просмотр не трогает агрегаты вовсе.
+    """
+    async with async_session() as db:
+        today = local_date(datetime.utcnow(), await get_user_timezone(db, user_id))
+        newest_id = await db.scalar(
+            select(MoodEntry.id)
+            .where(MoodEntry.user_id == user_id)
+            .order_by(MoodEntry.created_at.desc())
+            .limit(1)
+        )
+    return today, newest_id
+
+
+async def load_graph_points(user_id: int, period: str, today: date) -> List[GraphPoint]:
+    """Точки графика за период: агрегация в SQL, затем LTTB до GRAPH_MAX_POINTS.
+
+    Сколько бы лет истории ни было, в рендер уходит не больше
+    GRAPH_MAX_POINTS точек, поэтому его стоимость от длины истории не зависит.
+    """
+    async with async_session() as db:
+        days = GRAPH_PERIOD_DAYS[period]
+        if days is None:
+            since = await first_day(db, user_id)
+            if since is None:
+                return []
+            days = (today - since).days + 1
+        else:
+            since = today - timedelta(days=days - 1)
+        points = await bucketed_days(db, user_id, since, choose_bucket(days))
+    return lttb(points, GRAPH_MAX_POINTS)
+
 
 @router.callback_query(F.data == "menu_graph")
 async def cmd_graph(callback: CallbackQuery):
+    await show_graph(callback, DEFAULT_PERIOD)
+
+
+@router.callback_query(F.data.startswith("graph_period:"))
+async def cmd_graph_period(callback: CallbackQuery):
+    period = callback.data.split(":", 1)[1]
+    if period not in GRAPH_PERIOD_DAYS:
+        await callback.answer("Неизвестный период", show_alert=True)
+        return
+    await show_graph(callback, period)
+
+
+async def show_graph(callback: CallbackQuery, period: str):
     user_id = callback.from_user.id
-    logger.info(f"User {user_id} requested mood graph")
+    logger.info(f"User {user_id} requested mood graph for {period}")
 
-    db = SessionLocal()
     try:
-        entries = (
-            db.query(MoodEntry)
-            .filter(MoodEntry.user_id == user_id)
-            .order_by(MoodEntry.created_at.desc())
-            .limit(30)
-            .all()
+        today, newest_id = await graph_probe(user_id)
+        cache_key = graph_cache_key(
+            user_id, f"{newest_id}:{today.isoformat()}:{period}:{GRAPH_BACKEND}:{GRAPH_MAX_POINTS}"
         )
+        graph_png = await graph_cache.get(user_id, cache_key) if newest_id is not None else None
+        points = []
+        if graph_png is None and newest_id is not None:
+            points = await load_graph_points(user_id, period, today)
 
-        if not entries:
-            logger.info(f"No entries found for user {user_id}")
-            try:
-                await callback.message.edit_text(
+        if graph_png is None and not points:
+            logger.info(f"No entries found for user {user_id} in {period}")
+            if period == "all":
+                text = (
                     "📊 График настроения\n\n"
                     "У тебя пока нет записей.\n\n"
-                    "Начни вести дневник — и я покажу визуализацию!",
-                    reply_markup=get_back_keyboard(),
+                    "Начни вести дневник — и я покажу визуализацию!"
                 )
-            except Exception:
-                await callback.message.answer(
+                keyboard = get_back_keyboard()
+            else:
+                text = (
                     "📊 График настроения\n\n"
-                    "У тебя пока нет записей.\n\n"
-                    "Начни вести дневник — и я покажу визуализацию!",
-                    reply_markup=get_back_keyboard(),
+                    f"Записей {GRAPH_CAPTIONS[period]} нет.\n\n"
+                    "Выбери период подлиннее."
                 )
-            await callback.answer()
+                keyboard = get_graph_keyboard(period)
+            try:
+                await callback.message.edit_text(text, reply_markup=keyboard)
+            except Exception:
+                await callback.message.answer(text, reply_markup=keyboard)
             return
 
-        entries = list(reversed(entries))
-        logger.info(f"Generating graph with {len(entries)} entries for user {user_id}")
 
         try:
-            graph_buffer = generate_mood_graph(entries)
+            if graph_png is None:
+                logger.info(f"Generating {period} graph with {len(points)} points for user {user_id}")
+                with RENDER_SECONDS.time(f"graph_{GRAPH_BACKEND}"):
+                    graph_png = await render_pool.run(get_graph_renderer(), points)
+                await graph_cache.put(user_id, cache_key, graph_png)
+            else:
+                logger.info(f"Serving cached graph for user {user_id}")
+
             await callback.message.delete()
-            await callback.message.answer_photo(
-                photo=BufferedInputFile(graph_buffer.read(), filename="mood_graph.png"),
-                caption="📈 Твой график настроения за последние 30 дней",
-                reply_markup=get_back_keyboard(),
+            await send_photo_cached(
+                callback.bot,
+                callback.message.chat.id,
+                graph_png,
+                filename="mood_graph.png",
+                kind="graph",
+                caption=f"📈 Твой график настроения {GRAPH_CAPTIONS[period]}",
+                reply_markup=get_graph_keyboard(period),
             )
             logger.info(f"Sent mood graph to user {user_id}")
+        except RenderPoolBusy as e:
+            logger.warning(f"Render pool busy, rejected graph for user {user_id}: {e}")
+            await callback.message.answer(
+                "📊 Сейчас строится много графиков. Попробуй через минуту 🙏",
+                reply_markup=get_back_keyboard(),
+            )
         except Exception as e:
             logger.error(f"Error generating graph for user {user_id}: {e}")
             try:
@@ -75,5 +172,4 @@ async def cmd_graph(callback: CallbackQuery):
                 )
 
     finally:
-        db.close()
         await callback.answer()
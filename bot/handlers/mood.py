@@ -5,11 +5,17 @@ from aiogram import Router, F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import Message, CallbackQuery
+from sqlalchemy import select
 
-from database import SessionLocal
+from database import async_session
 from models import MoodEntry
+from moods import MOOD_OPTIONS, mood_code
 from keyboards import get_mood_keyboard, get_back_keyboard
 from ai_service import analyze_mood
+from graph_cache import graph_cache
+from calendar_cache import calendar_cache
+from rollup import record_entry, get_user_timezone, local_date
+from stats import record_conversion
 
 logger = logging.getLogger(__name__)
 
@@ -21,15 +27,6 @@ class MoodState(StatesGroup):
     waiting_for_text = State()
 
 
-MOOD_OPTIONS = [
-    "😄 Отличное",
-    "🙂 Хорошее",
-    "😐 Нормальное",
-    "😔 Плохое",
-    "😢 Очень плохое",
-]
-
-
 @router.callback_query(F.data == "menu_mood")
 async def start_mood_entry(callback: CallbackQuery):
     try:
@@ -85,27 +82,31 @@ async def process_text(message: Message, state: FSMContext):
         await state.clear()
         return
 
-    db = SessionLocal()
     try:
-        entry = MoodEntry(
-            user_id=user_id,
-            mood=mood,
-            text=text,
-            created_at=datetime.utcnow(),
-        )
-        db.add(entry)
-        db.commit()
-        db.refresh(entry)
-        logger.info(f"Saved mood entry {entry.id} for user {user_id}")
-
-        recent_entries = (
-            db.query(MoodEntry)
-            .filter(MoodEntry.user_id == user_id)
-            .order_by(MoodEntry.created_at.desc())
-            .limit(7)
-            .all()
-        )
-        recent_entries = [e for e in recent_entries if e.id != entry.id][:7]
+        async with async_session() as db:
+            created_at = datetime.utcnow()
+            entry = MoodEntry(
+                user_id=user_id,
+                mood_code=mood_code(mood),
+                text=text,
+                created_at=created_at,
+                local_date=local_date(created_at, await get_user_timezone(db, user_id)),
+            )
+            db.add(entry)
+            await record_entry(db, entry)
+            await record_conversion(db, user_id, created_at)
+            await db.commit()
+            logger.info(f"Saved mood entry {entry.id} for user {user_id}")
+            await graph_cache.invalidate(user_id)
+            calendar_cache.invalidate(user_id, entry.local_date)
+
+            result = await db.scalars(
+                select(MoodEntry)
+                .where(MoodEntry.user_id == user_id, MoodEntry.id != entry.id)
+                .order_by(MoodEntry.created_at.desc())
+                .limit(7)
+            )
+            recent_entries = list(result)
 
         await message.answer("Сохраняю запись и анализирую настроение...")
         analysis = await analyze_mood(mood, text, recent_entries)
@@ -132,5 +133,4 @@ async def process_text(message: Message, state: FSMContext):
             )
 
     finally:
-        db.close()
         await state.clear()
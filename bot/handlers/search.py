@@ -0,0 +1,103 @@
+import logging
+from typing import Optional, Tuple
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, CallbackQuery
+
+from keyboards import get_back_keyboard, get_search_keyboard
+from moods import mood_emoji
+from search import search_entries, SEARCH_PAGE_SIZE, MAX_QUERY_CHARS, MAX_QUERY_WORDS
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+# Запрос живёт в заголовке сообщения с результатами, а не в FSM: кнопка «Ещё»
+# берёт его оттуда и работает после сброса состояния и перезапуска бота.
+# В callback_data (64 байта) остаётся только курсор.
+HEADER_PREFIX = "🔎 Поиск: «"
+HEADER_SUFFIX = "»"
+
+
+def format_header(query: str) -> str:
+    return f"{HEADER_PREFIX}{query}{HEADER_SUFFIX}"
+
+
+def parse_header(text: Optional[str]) -> Optional[str]:
+    header = (text or "").split("\n", 1)[0]
+    if not header.startswith(HEADER_PREFIX) or not header.endswith(HEADER_SUFFIX):
+        return None
+    return header[len(HEADER_PREFIX):-len(HEADER_SUFFIX)] or None
+
+
+def parse_cursor(data: str) -> Optional[Tuple[int, float, int]]:
+    try:
+        _, block, score, entry_id = data.split(":")
+        return int(block), float(score), int(entry_id)
+    except ValueError:
+        return None
+
+
+async def find_page(user_id: int, query: str, after: Optional[Tuple[int, float, int]] = None):
+    # Одна лишняя строка показывает, есть ли следующая страница
+    hits = await search_entries(user_id, query, after=after, limit=SEARCH_PAGE_SIZE + 1)
+    page = hits[:SEARCH_PAGE_SIZE]
+    more_data = None
+    if len(hits) > SEARCH_PAGE_SIZE:
+        last = page[-1]
+        more_data = f"search_more:{last.block}:{last.score!r}:{last.id}"
+
+    if not page:
+        text = (
+            f"{format_header(query)}\n\n"
+            + ("Больше ничего не нашлось." if after else "Ничего не нашлось. Попробуй другие слова.")
+        )
+        return text, get_back_keyboard()
+
+    lines = [format_header(query)]
+    for hit in page:
+        day = hit.local_date.strftime("%d.%m.%Y") if hit.local_date else "—"
+        lines.append(f"{mood_emoji(hit.mood_code)} {day}\n{hit.snippet}")
+    return "\n\n".join(lines), get_search_keyboard([hit.local_date for hit in page if hit.local_date], more_data)
+
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, command: CommandObject):
+    # Запрос — одна строка: так он целиком помещается в заголовок
+    query = " ".join((command.args or "").split())
+    if not query:
+        await message.answer(
+            "🔎 Поиск по записям\n\n"
+            "Напиши слова после команды:\n"
+            "/search прогулка парк",
+            reply_markup=get_back_keyboard(),
+        )
+        return
+    if len(query) > MAX_QUERY_CHARS or len(query.split()) > MAX_QUERY_WORDS:
+        await message.answer(
+            f"🔎 Слишком длинный запрос — не больше {MAX_QUERY_WORDS} слов и {MAX_QUERY_CHARS} символов.",
+            reply_markup=get_back_keyboard(),
+        )
+        return
+
+    user_id = message.from_user.id
+    logger.info(f"User {user_id} searched entries: {query[:50]}")
+    text, keyboard = await find_page(user_id, query)
+    await message.answer(text, reply_markup=keyboard)
+
+
+@router.callback_query(F.data.startswith("search_more:"))
+async def search_more(callback: CallbackQuery):
+    query = parse_header(getattr(callback.message, "text", None))
+    cursor = parse_cursor(callback.data)
+    if not query or cursor is None:
+        await callback.answer("Поиск устарел — повтори /search", show_alert=True)
+        return
+
+    text, keyboard = await find_page(callback.from_user.id, query, after=cursor)
+    try:
+        await callback.message.edit_text(text, reply_markup=keyboard)
+    except Exception:
+        await callback.message.answer(text, reply_markup=keyboard)
+    await callback.answer()
@@ -0,0 +1,144 @@
+import logging
+
+from aiogram import Router, F
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
+
+from config import TIMEZONE, MOOD_CHECK_TIME
+from keyboards import (
+    get_settings_keyboard,
+    get_reminder_time_keyboard,
+    get_timezone_keyboard,
+    get_back_keyboard,
+    TIMEZONES,
+)
+from models import USER_ACTIVE, USER_INACTIVE
+from reminders import get_reminder_settings, update_reminder_settings, parse_reminder_time, get_zone
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+KNOWN_TIMEZONES = {zone for _, zone in TIMEZONES}
+
+
+class SettingsState(StatesGroup):
+    waiting_for_time = State()
+
+
+async def edit_or_answer(callback: CallbackQuery, text: str, reply_markup: InlineKeyboardMarkup):
+    try:
+        await callback.message.edit_text(text, reply_markup=reply_markup)
+    except Exception:
+        await callback.message.answer(text, reply_markup=reply_markup)
+
+
+def format_settings(user) -> str:
+    reminder_time = (user.reminder_time if user else None) or MOOD_CHECK_TIME
+    tz_name = (user.timezone if user else None) or TIMEZONE
+    enabled = user is None or user.status == USER_ACTIVE
+    return (
+        "⏰ Напоминания\n\n"
+        f"Статус: {'включены' if enabled else 'выключены'}\n"
+        f"Время: {reminder_time}\n"
+        f"Часовой пояс: {tz_name}"
+    )
+
+
+async def show_settings(callback: CallbackQuery):
+    user = await get_reminder_settings(callback.from_user.id)
+    enabled = user is None or user.status == USER_ACTIVE
+    await edit_or_answer(callback, format_settings(user), get_settings_keyboard(enabled))
+
+
+@router.callback_query(F.data == "menu_settings")
+async def cmd_settings(callback: CallbackQuery, state: FSMContext):
+    await state.clear()
+    await show_settings(callback)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "settings_time")
+async def choose_time(callback: CallbackQuery):
+    await edit_or_answer(
+        callback,
+        "🕗 Во сколько напоминать?\n\nВыбери время или задай своё.",
+        get_reminder_time_keyboard(),
+    )
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("settings_time:"))
+async def set_time(callback: CallbackQuery):
+    value = callback.data.split(":", 1)[1]
+    if parse_reminder_time(value) is None:
+        await callback.answer("Некорректное время", show_alert=True)
+        return
+
+    await update_reminder_settings(callback.from_user.id, reminder_time=value)
+    logger.info(f"User {callback.from_user.id} set reminder time to {value}")
+    await show_settings(callback)
+    await callback.answer("Время сохранено")
+
+
+@router.callback_query(F.data == "settings_time_custom")
+async def ask_custom_time(callback: CallbackQuery, state: FSMContext):
+    await state.set_state(SettingsState.waiting_for_time)
+    await edit_or_answer(
+        callback,
+        "✏️ Введите время в формате ЧЧ:ММ\nПример: 21:15",
+        get_back_keyboard(),
+    )
+    await callback.answer()
+
+
+@router.message(SettingsState.waiting_for_time)
+async def process_custom_time(message: Message, state: FSMContext):
+    parsed = parse_reminder_time(message.text or "")
+    if parsed is None:
+        await message.answer(
+            "❌ Не понял время. Введите в формате ЧЧ:ММ, например 21:15",
+            reply_markup=get_back_keyboard(),
+        )
+        return
+
+    value = f"{parsed[0]:02d}:{parsed[1]:02d}"
+    user = await update_reminder_settings(message.from_user.id, reminder_time=value)
+    await state.clear()
+    logger.info(f"User {message.from_user.id} set reminder time to {value}")
+    await message.answer(
+        format_settings(user),
+        reply_markup=get_settings_keyboard(user.status == USER_ACTIVE),
+    )
+
+
+@router.callback_query(F.data == "settings_tz")
+async def choose_timezone(callback: CallbackQuery):
+    await edit_or_answer(callback, "🌍 Выбери свой часовой пояс:", get_timezone_keyboard())
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith("settings_tz:"))
+async def set_timezone(callback: CallbackQuery):
+    tz_name = callback.data.split(":", 1)[1]
+    if tz_name not in KNOWN_TIMEZONES or get_zone(tz_name).key != tz_name:
+        await callback.answer("Неизвестный часовой пояс", show_alert=True)
+        return
+
+    await update_reminder_settings(callback.from_user.id, tz_name=tz_name)
+    logger.info(f"User {callback.from_user.id} set timezone to {tz_name}")
+    await show_settings(callback)
+    await callback.answer("Часовой пояс сохранён")
+
+
+@router.callback_query(F.data == "settings_toggle")
+async def toggle_reminders(callback: CallbackQuery):
+    user = await get_reminder_settings(callback.from_user.id)
+    enabled = user is None or user.status == USER_ACTIVE
+    status = USER_INACTIVE if enabled else USER_ACTIVE
+
+    await update_reminder_settings(callback.from_user.id, status=status)
+    logger.info(f"User {callback.from_user.id} set reminders {status}")
+    await show_settings(callback)
+    await callback.answer()
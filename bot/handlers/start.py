@@ -1,12 +1,13 @@
 import logging
 from aiogram import Router, F, Bot
 from aiogram.filters import Command
-from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton, ChatMemberUpdated
 from aiogram.fsm.context import FSMContext
 
 from keyboards import get_main_menu, get_back_keyboard
-from scheduler import add_user
+from registry import add_user
 from config import CHANNEL_ID, CHANNEL_USERNAME
+from subscription_cache import subscription_cache
 
 logger = logging.getLogger(__name__)
 
@@ -36,8 +37,8 @@ async def check_subscription_handler(callback: CallbackQuery, bot: Bot):
         return
     
     try:
-        member = await bot.get_chat_member(CHANNEL_ID, user_id)
-        is_subscribed = member.status in ["member", "administrator", "creator"]
+        # Кэш уже сброшен в SubscriptionMiddleware, так что это свежий статус
+        is_subscribed = await subscription_cache.is_subscribed(bot, user_id)
         
         if is_subscribed:
             await callback.message.answer(
@@ -65,6 +66,24 @@ async def check_subscription_handler(callback: CallbackQuery, bot: Bot):
     await callback.answer()
 
 
+def is_subscription_channel(update: ChatMemberUpdated) -> bool:
+    if not CHANNEL_ID:
+        return False
+    if CHANNEL_ID.startswith("@"):
+        return (update.chat.username or "").lower() == CHANNEL_ID[1:].lower()
+    return str(update.chat.id) == CHANNEL_ID
+
+
+@router.chat_member()
+async def on_channel_member_update(update: ChatMemberUpdated):
+    """Telegram сам сообщает о (от)писке — обновляем кэш без запроса get_chat_member"""
+    if not is_subscription_channel(update):
+        return
+    user_id = update.new_chat_member.user.id
+    subscription_cache.set_status(user_id, update.new_chat_member.status)
+    logger.info(f"User {user_id} channel status changed to {update.new_chat_member.status}")
+
+
 @router.callback_query(F.data == "menu_back")
 async def menu_back(callback: CallbackQuery, state: FSMContext):
     await state.clear()
@@ -1,35 +1,42 @@
 import io
 import platform
-from typing import Tuple
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
 from PIL import Image, ImageDraw, ImageFont
 
+from metrics import RENDER_SECONDS, timed
 
-def get_fonts() -> Tuple[ImageFont.FreeTypeFont, ...]:
+
+def get_font_paths() -> List[str]:
     system = platform.system()
 
     if system == "Darwin":
-        font_paths = [
+        return [
             "/System/Library/Fonts/Helvetica.ttc",
             "/Library/Fonts/Arial.ttf",
             "/System/Library/Fonts/Supplemental/Arial.ttf",
         ]
     elif system == "Linux":
-        font_paths = [
+        return [
             "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
             "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
             "/usr/share/fonts/TTF/DejaVuSans.ttf",
             "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
         ]
     else:
-        font_paths = ["C:\\Windows\\Fonts\\arial.ttf"]
+        return ["C:\\Windows\\Fonts\\arial.ttf"]
 
+
+@lru_cache(maxsize=1)
+def get_fonts() -> Tuple[ImageFont.FreeTypeFont, ...]:
+    """Шрифты загружаются с диска один раз на процесс"""
     title_font = None
     subtitle_font = None
     text_font = None
     quote_font = None
 
-    for path in font_paths:
+    for path in get_font_paths():
         try:
             title_font = ImageFont.truetype(path, 56)
             subtitle_font = ImageFont.truetype(path, 36)
@@ -48,116 +55,192 @@ def get_fonts() -> Tuple[ImageFont.FreeTypeFont, ...]:
     return title_font, subtitle_font, text_font, quote_font
 
 
-def wrap_text(
+# (шрифт, режим изображения, слово) -> (ширина advance, верх bbox, низ bbox, ширина bbox)
+TokenMetrics = Tuple[float, float, float, float]
+TOKEN_CACHE_LIMIT = 8192
+_token_metrics: Dict[Tuple[ImageFont.FreeTypeFont, str, str], TokenMetrics] = {}
+
+
+def measure_token(
+    draw: ImageDraw.ImageDraw,
+    token: str,
+    font: ImageFont.FreeTypeFont
+) -> TokenMetrics:
+    key = (font, draw.mode, token)
+    metrics = _token_metrics.get(key)
+    if metrics is None:
+        if len(_token_metrics) >= TOKEN_CACHE_LIMIT:
+            _token_metrics.clear()
+        left, top, right, bottom = draw.textbbox((0, 0), token, font=font)
+        metrics = (draw.textlength(token, font=font), top, bottom, right - left)
+        _token_metrics[key] = metrics
+    return metrics
+
+
+def layout_text(
     draw: ImageDraw.ImageDraw,
     text: str,
     font: ImageFont.FreeTypeFont,
     max_width: int
-) -> list:
+) -> List[Tuple[str, float]]:
+    """Разбивает текст на строки не шире max_width и возвращает (строка, высота).
+
+    Каждое слово измеряется один раз (с кэшем по шрифту), ширина строки
+    набирается суммой advance-ширин. Точный textbbox всей строки нужен
+    только когда оценка попадает в узкую полосу у max_width, поэтому
+    переносы совпадают с посимвольным измерением всей строки.
+    """
     words = text.split()
+    if not words:
+        return []
+
+    space = draw.textlength(" ", font=font)
+    # Запас на кернинг и боковые отступы крайних глифов
+    slack = max(2.0, getattr(font, "size", 10) * 0.25)
+
     lines = []
-    current_line = ""
+    current_words: List[str] = []
+    current_width = 0.0
+    current_top = current_bottom = 0.0
+
+    def flush():
+        lines.append((" ".join(current_words), current_bottom - current_top))
 
     for word in words:
-        test_line = f"{current_line} {word}".strip()
-        bbox = draw.textbbox((0, 0), test_line, font=font)
-        if bbox[2] - bbox[0] <= max_width:
-            current_line = test_line
+        advance, top, bottom, ink_width = measure_token(draw, word, font)
+
+        if current_words:
+            estimate = current_width + space + advance
+            if estimate <= max_width - slack:
+                fits = True
+            elif estimate > max_width + slack:
+                fits = False
+            else:
+                bbox = draw.textbbox((0, 0), " ".join(current_words + [word]), font=font)
+                fits = bbox[2] - bbox[0] <= max_width
+        else:
+            fits = ink_width <= max_width
+
+        if fits:
+            if current_words:
+                current_width += space + advance
+                current_top = min(current_top, top)
+                current_bottom = max(current_bottom, bottom)
+            else:
+                current_width, current_top, current_bottom = advance, top, bottom
+            current_words.append(word)
         else:
-            if current_line:
-                lines.append(current_line)
-            current_line = word
+            if current_words:
+                flush()
+            current_words = [word]
+            current_width, current_top, current_bottom = advance, top, bottom
 
-    if current_line:
-        lines.append(current_line)
+    if current_words:
+        flush()
 
     return lines
 
 
-def generate_mood_image(
-    mood: str,
-    trend: str,
-    quote: str
-) -> io.BytesIO:
-    width, height = 1080, 1350
-
-    colors = {
-        "😄": ("#FFF9E6", "#F57F17", "#FFD54F", "#FFF3E0"),
-        "🙂": ("#E8F5E9", "#2E7D32", "#81C784", "#C8E6C9"),
-        "😐": ("#ECEFF1", "#455A64", "#90A4AE", "#CFD8DC"),
-        "😔": ("#E3F2FD", "#1565C0", "#64B5F6", "#BBDEFB"),
-        "😢": ("#EDE7F6", "#512DA8", "#9575CD", "#D1C4E9"),
-    }
-
-    bg_color, accent_color, secondary_color, card_bg = colors.get(
-        mood.split()[0], ("#FAFAFA", "#616161", "#9E9E9E", "#EEEEEE")
-    )
+def wrap_text(
+    draw: ImageDraw.ImageDraw,
+    text: str,
+    font: ImageFont.FreeTypeFont,
+    max_width: int
+) -> list:
+    return [line for line, _ in layout_text(draw, text, font, max_width)]
 
-    image = Image.new("RGB", (width, height), bg_color)
-    draw = ImageDraw.Draw(image)
 
-    title_font, subtitle_font, text_font, quote_font = get_fonts()
+WIDTH, HEIGHT = 1080, 1350
+PADDING = 80
+CARD_PADDING = 50
+
+MOOD_PALETTES = {
+    "😄": ("#FFF9E6", "#F57F17", "#FFD54F", "#FFF3E0"),
+    "🙂": ("#E8F5E9", "#2E7D32", "#81C784", "#C8E6C9"),
+    "😐": ("#ECEFF1", "#455A64", "#90A4AE", "#CFD8DC"),
+    "😔": ("#E3F2FD", "#1565C0", "#64B5F6", "#BBDEFB"),
+    "😢": ("#EDE7F6", "#512DA8", "#9575CD", "#D1C4E9"),
+}
+DEFAULT_PALETTE = ("#FAFAFA", "#616161", "#9E9E9E", "#EEEEEE")
+
+# Отступ первой строки тренда от верха карточки
+CARD_TOP = PADDING + 90 + 80
+
+
+def get_palette(mood: str) -> Tuple[str, str, str, str]:
+    return MOOD_PALETTES.get(mood.split()[0], DEFAULT_PALETTE)
+
 
-    padding = 80
-    card_padding = 50
-    content_width = width - (padding * 2)
-    card_width = width - (card_padding * 2)
+@lru_cache(maxsize=16)
+def get_base_canvas(mood: str) -> Image.Image:
+    """Статичная часть карточки: фон, emoji, название настроения, карточка и заголовок тренда.
 
-    y_position = padding
+    Вариантов всего пять (плюс запасной), поэтому каждый рисуется один раз,
+    а рендер только копирует готовое изображение.
+    """
+    bg_color, accent_color, secondary_color, card_bg = get_palette(mood)
+    title_font, subtitle_font, text_font, _ = get_fonts()
+
+    image = Image.new("RGB", (WIDTH, HEIGHT), bg_color)
+    draw = ImageDraw.Draw(image)
+
+    y_position = PADDING
 
     mood_emoji = mood.split()[0]
-    draw.text((width / 2, y_position), mood_emoji, font=title_font,
+    draw.text((WIDTH / 2, y_position), mood_emoji, font=title_font,
               fill=accent_color, anchor="mt")
     y_position += 90
 
-    draw.text((width / 2, y_position), mood, font=subtitle_font,
+    draw.text((WIDTH / 2, y_position), mood, font=subtitle_font,
               fill=accent_color, anchor="mt")
-    y_position += 80
-
-    card_y_start = y_position
-    card_y = y_position + card_padding
 
     draw.rounded_rectangle(
-        [(card_padding, card_y_start), (width - card_padding, height - padding)],
+        [(CARD_PADDING, CARD_TOP), (WIDTH - CARD_PADDING, HEIGHT - PADDING)],
         radius=24,
         fill=card_bg,
     )
 
-    trend_label = "ТЕНДЕНЦИЯ"
-    draw.text((card_padding + card_padding, card_y), trend_label,
+    draw.text((CARD_PADDING + CARD_PADDING, CARD_TOP + CARD_PADDING), "ТЕНДЕНЦИЯ",
               font=text_font, fill=secondary_color)
-    card_y += 45
 
-    trend_lines = wrap_text(draw, trend, text_font, content_width - 40)
-    for line in trend_lines:
-        bbox = draw.textbbox((0, 0), line, font=text_font)
-        line_height = bbox[3] - bbox[1]
-        draw.text((card_padding + card_padding, card_y), line,
-                  font=text_font, fill="#212121")
+    return image
+
+
+@timed(RENDER_SECONDS, "mood_image")
+def generate_mood_image(
+    mood: str,
+    trend: str,
+    quote: str
+) -> io.BytesIO:
+    _, _, secondary_color, _ = get_palette(mood)
+    _, _, text_font, quote_font = get_fonts()
+
+    image = get_base_canvas(mood).copy()
+    draw = ImageDraw.Draw(image)
+
+    content_width = WIDTH - (PADDING * 2)
+    text_x = CARD_PADDING + CARD_PADDING
+
+    card_y = CARD_TOP + CARD_PADDING + 45
+
+    for line, line_height in layout_text(draw, trend, text_font, content_width - 40):
+        draw.text((text_x, card_y), line, font=text_font, fill="#212121")
         card_y += line_height + 6
 
     card_y += 30
 
-    divider_y = card_y
     draw.line(
-        [(card_padding + card_padding, divider_y),
-         (width - card_padding - card_padding, divider_y)],
+        [(text_x, card_y), (WIDTH - CARD_PADDING - CARD_PADDING, card_y)],
         fill=secondary_color,
         width=2,
     )
     card_y += 40
 
-    quote_label = "ЦИТАТА ДНЯ"
-    draw.text((card_padding + card_padding, card_y), quote_label,
-              font=text_font, fill=secondary_color)
+    draw.text((text_x, card_y), "ЦИТАТА ДНЯ", font=text_font, fill=secondary_color)
     card_y += 45
 
-    quote_lines = wrap_text(draw, f'"{quote}"', quote_font, content_width - 40)
-    for line in quote_lines:
-        bbox = draw.textbbox((0, 0), line, font=quote_font)
-        line_height = bbox[3] - bbox[1]
-        draw.text((card_padding + card_padding, card_y), line,
-                  font=quote_font, fill="#424242")
+    for line, line_height in layout_text(draw, f'"{quote}"', quote_font, content_width - 40):
+        draw.text((text_x, card_y), line, font=quote_font, fill="#424242")
         card_y += line_height + 8
 
     buffer = io.BytesIO()
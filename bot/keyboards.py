@@ -1,27 +1,30 @@
+import calendar
+from datetime import date
+from typing import Dict, List, Optional
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton
 
+from moods import MOOD_OPTIONS, mood_emoji
+
 
 def get_main_menu() -> InlineKeyboardMarkup:
     buttons = [
         [
             InlineKeyboardButton(text="📊 График", callback_data="menu_graph", style="primary"),
-            InlineKeyboardButton(text="📅 По дате", callback_data="menu_date", style="primary"),
+            InlineKeyboardButton(text="📅 Календарь", callback_data="menu_date", style="primary"),
         ],
         [
             InlineKeyboardButton(text="✍️ Записать день", callback_data="menu_mood", style="success"),
         ],
+        [
+            InlineKeyboardButton(text="⏰ Напоминания", callback_data="menu_settings"),
+        ],
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
 def get_mood_keyboard() -> ReplyKeyboardMarkup:
-    buttons = [
-        [KeyboardButton(text="😄 Отличное")],
-        [KeyboardButton(text="🙂 Хорошее")],
-        [KeyboardButton(text="😐 Нормальное")],
-        [KeyboardButton(text="😔 Плохое")],
-        [KeyboardButton(text="😢 Очень плохое")],
-    ]
+    buttons = [[KeyboardButton(text=label)] for label in MOOD_OPTIONS]
     return ReplyKeyboardMarkup(
         keyboard=buttons,
         one_time_keyboard=True,
@@ -33,4 +36,139 @@ def get_back_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text="⬅ Назад", callback_data="menu_back")],
     ]
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+GRAPH_PERIODS = [
+    ("week", "7 дней"),
+    ("month", "30 дней"),
+    ("year", "Год"),
+    ("all", "Всё время"),
+]
+
+
+def get_graph_keyboard(active: str) -> InlineKeyboardMarkup:
+    buttons = [
+        [
+            InlineKeyboardButton(
+                text=f"• {title} •" if key == active else title,
+                callback_data=f"graph_period:{key}",
+            )
+            for key, title in GRAPH_PERIODS
+        ],
+        [InlineKeyboardButton(text="⬅ Назад", callback_data="menu_back")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+MONTH_NAMES = [
+    "Январь", "Февраль", "Март", "Апрель", "Май", "Июнь",
+    "Июль", "Август", "Сентябрь", "Октябрь", "Ноябрь", "Декабрь",
+]
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
+
+def get_calendar_keyboard(year: int, month: int, marks: Dict[int, int]) -> InlineKeyboardMarkup:
+    """Сетка месяца: у дней с записями рядом с числом emoji среднего настроения"""
+    prev_year, prev_month = (year - 1, 12) if month == 1 else (year, month - 1)
+    next_year, next_month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    buttons = [
+        [
+            InlineKeyboardButton(text="«", callback_data=f"cal_month:{prev_year:04d}-{prev_month:02d}"),
+            InlineKeyboardButton(text=f"{MONTH_NAMES[month - 1]} {year}", callback_data="cal_noop"),
+            InlineKeyboardButton(text="»", callback_data=f"cal_month:{next_year:04d}-{next_month:02d}"),
+        ],
+        [InlineKeyboardButton(text=day, callback_data="cal_noop") for day in WEEKDAYS],
+    ]
+    for week in calendar.monthcalendar(year, month):
+        row = []
+        for day in week:
+            if day == 0:
+                row.append(InlineKeyboardButton(text=" ", callback_data="cal_noop"))
+                continue
+            text = f"{day}{mood_emoji(marks[day])}" if day in marks else str(day)
+            row.append(InlineKeyboardButton(text=text, callback_data=f"cal_day:{year:04d}-{month:02d}-{day:02d}"))
+        buttons.append(row)
+
+    buttons.append([InlineKeyboardButton(text="⌨️ Ввести дату", callback_data="date_manual")])
+    buttons.append([InlineKeyboardButton(text="⬅ Назад", callback_data="menu_back")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_day_keyboard(year: int, month: int) -> InlineKeyboardMarkup:
+    buttons = [
+        [InlineKeyboardButton(text="« К календарю", callback_data=f"cal_month:{year:04d}-{month:02d}")],
+        [InlineKeyboardButton(text="⬅ Назад", callback_data="menu_back")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_search_keyboard(days: List[date], more_data: Optional[str]) -> InlineKeyboardMarkup:
+    """Кнопки перехода к дням найденных записей и следующей страницы"""
+    buttons = []
+    for day in dict.fromkeys(days):
+        buttons.append([InlineKeyboardButton(
+            text=f"📅 {day.strftime('%d.%m.%Y')}",
+            callback_data=f"cal_day:{day.isoformat()}",
+        )])
+    if more_data:
+        buttons.append([InlineKeyboardButton(text="Ещё ▶", callback_data=more_data)])
+    buttons.append([InlineKeyboardButton(text="⬅ Назад", callback_data="menu_back")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+REMINDER_HOURS = ["08:00", "10:00", "12:00", "18:00", "19:00", "20:00", "20:30", "21:00", "22:00", "23:00"]
+
+TIMEZONES = [
+    ("Калининград (UTC+2)", "Europe/Kaliningrad"),
+    ("Москва (UTC+3)", "Europe/Moscow"),
+    ("Самара (UTC+4)", "Europe/Samara"),
+    ("Екатеринбург (UTC+5)", "Asia/Yekaterinburg"),
+    ("Омск (UTC+6)", "Asia/Omsk"),
+    ("Новосибирск (UTC+7)", "Asia/Novosibirsk"),
+    ("Иркутск (UTC+8)", "Asia/Irkutsk"),
+    ("Якутск (UTC+9)", "Asia/Yakutsk"),
+    ("Владивосток (UTC+10)", "Asia/Vladivostok"),
+    ("Магадан (UTC+11)", "Asia/Magadan"),
+    ("Камчатка (UTC+12)", "Asia/Kamchatka"),
+]
+
+
+def get_settings_keyboard(enabled: bool) -> InlineKeyboardMarkup:
+    buttons = [
+        [
+            InlineKeyboardButton(text="🕗 Время", callback_data="settings_time"),
+            InlineKeyboardButton(text="🌍 Часовой пояс", callback_data="settings_tz"),
+        ],
+        [
+            InlineKeyboardButton(
+                text="🔕 Выключить" if enabled else "🔔 Включить",
+                callback_data="settings_toggle",
+            ),
+        ],
+        [InlineKeyboardButton(text="⬅ Назад", callback_data="menu_back")],
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_reminder_time_keyboard() -> InlineKeyboardMarkup:
+    buttons = [
+        [
+            InlineKeyboardButton(text=value, callback_data=f"settings_time:{value}")
+            for value in REMINDER_HOURS[i:i + 5]
+        ]
+        for i in range(0, len(REMINDER_HOURS), 5)
+    ]
+    buttons.append([InlineKeyboardButton(text="✏️ Своё время", callback_data="settings_time_custom")])
+    buttons.append([InlineKeyboardButton(text="⬅ Назад", callback_data="menu_settings")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def get_timezone_keyboard() -> InlineKeyboardMarkup:
+    buttons = [
+        [InlineKeyboardButton(text=title, callback_data=f"settings_tz:{zone}")]
+        for title, zone in TIMEZONES
+    ]
+    buttons.append([InlineKeyboardButton(text="⬅ Назад", callback_data="menu_settings")])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -1,11 +1,22 @@
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 
-from config import BOT_TOKEN
-from database import Base, engine
+from config import BOT_TOKEN, TELEGRAM_API_URL, BOT_MODE
+from database import engine, init_db
 from scheduler import scheduler
+from ai_service import mistral_client
+from render_pool import render_pool
 from middleware.subscription import SubscriptionMiddleware
+from middleware.registry import RegistryMiddleware
+from middleware.metrics import MetricsMiddleware, HandlerLabelMiddleware
+from metrics import metrics_server
+from registry import user_registry
+from fsm_storage import SQLiteStorage
+from reminders import backfill_next_fire
+from rollup import backfill_local_dates, backfill_daily_mood
+from stats import stats_service
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,8 +25,9 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
+session = AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None
+bot = Bot(token=BOT_TOKEN, session=session)
+dp = Dispatcher(storage=SQLiteStorage())
 
 
 def register_handlers():
@@ -24,8 +36,14 @@ def register_handlers():
     from handlers.graph import router as graph_router
     from handlers.day import router as day_router
     from handlers.admin import router as admin_router
+    from handlers.settings import router as settings_router
+    from handlers.search import router as search_router
+    from handlers.export import router as export_router
 
     dp.include_router(start_router)
+    dp.include_router(search_router)
+    dp.include_router(export_router)
+    dp.include_router(settings_router)
     dp.include_router(mood_router)
     dp.include_router(graph_router)
     dp.include_router(day_router)
@@ -33,7 +51,12 @@ def register_handlers():
 
 
 def register_middleware():
-    """Регистрация middleware для проверки подписки"""
+    """Регистрация middleware для метрик, реестра пользователей и проверки подписки"""
+    # Метрики — первыми, чтобы время включало ожидание базы и проверку подписки
+    dp.update.outer_middleware(MetricsMiddleware())
+    for observer in (dp.message, dp.callback_query, dp.chat_member, dp.my_chat_member):
+        observer.middleware(HandlerLabelMiddleware())
+    dp.update.outer_middleware(RegistryMiddleware())
     dp.message.middleware(SubscriptionMiddleware())
     dp.callback_query.middleware(SubscriptionMiddleware())
     logger.info("Subscription middleware registered")
@@ -41,17 +64,41 @@ def register_middleware():
 
 async def on_startup():
     logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
+    await init_db()
     logger.info("Database tables created")
     
+    logger.info("Starting user registry...")
+    await user_registry.start()
+    await backfill_next_fire()
+    await backfill_local_dates()
+    await backfill_daily_mood()
+
+    logger.info("Starting render pool...")
+    render_pool.start()
+
+    stats_service.start()
+    await metrics_server.start()
+
     logger.info("Starting scheduler...")
     scheduler.start()
-    logger.info("Scheduler started - daily mood check at 20:30")
+    logger.info("Scheduler started - per-user mood check reminders")
 
 
 async def on_shutdown():
     logger.info("Shutting down scheduler...")
     scheduler.stop()
+    await stats_service.stop()
+    await metrics_server.stop()
+    logger.info("Flushing user registry...")
+    await user_registry.stop()
+    logger.info("Stopping render pool...")
+    render_pool.stop()
+    logger.info("Closing AI client...")
+    await mistral_client.close()
+    logger.info("Flushing FSM storage...")
+    await dp.storage.close()
+    logger.info("Closing database engine...")
+    await engine.dispose()
     logger.info("Closing bot session...")
     await bot.session.close()
 
@@ -61,8 +108,15 @@ def main():
     register_middleware()
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
+    if BOT_MODE == "webhook":
+        from webhook import run_webhook
+        logger.info("Starting bot in webhook mode...")
+        run_webhook(dp, bot)
+        return
+
     logger.info("Starting bot in polling mode...")
-    dp.run_polling(bot)
+    # chat_member не приходит по умолчанию — запрашиваем все используемые типы апдейтов
+    dp.run_polling(bot, allowed_updates=dp.resolve_used_update_types())
 
 
 if __name__ == "__main__":
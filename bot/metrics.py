@@ -0,0 +1,260 @@
+import functools
+import inspect
+import logging
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+from sqlalchemy import event
+
+from config import METRICS_HOST, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин в секундах: от быстрых запросов к SQLite до ответа Mistral
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def total(self) -> float:
+        return sum(self._values.values())
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, labels)} {value:g}")
+        return lines
+
+
+class _Series:
+    __slots__ = ("buckets", "count", "sum")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+
+
+class Histogram:
+    """Гистограмма Prometheus: наблюдение — поиск корзины и три сложения"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.bounds = tuple(buckets)
+        self._series: Dict[Labels, _Series] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _Series(len(self.bounds) + 1)
+        series.buckets[bisect_left(self.bounds, value)] += 1
+        series.count += 1
+        series.sum += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def quantile(self, labels: Labels, q: float) -> Optional[float]:
+        """Оценка квантиля по корзинам — так же, как histogram_quantile в Prometheus"""
+        series = self._series.get(labels)
+        if series is None or not series.count:
+            return None
+        rank = q * series.count
+        seen = 0
+        for i, count in enumerate(series.buckets):
+            if seen + count >= rank and count:
+                if i == len(self.bounds):
+                    return self.bounds[-1]
+                lower = self.bounds[i - 1] if i else 0.0
+                return lower + (self.bounds[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.bounds[-1]
+
+    def summary(self) -> List[Tuple[Labels, int, float]]:
+        """(метки, число наблюдений, сумма) по убыванию суммарного времени"""
+        rows = [(labels, series.count, series.sum) for labels, series in self._series.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.bounds, series.buckets):
+                cumulative += count
+                bucket_labels = _format_labels(self.labels, labels, f'le="{bound:g}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(self.labels, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{bucket_labels} {series.count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {series.sum:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {series.count}")
+        return lines
+
+
+class CallbackGauge:
+    """Значение, которое читается в момент выдачи метрик (очереди, размеры кэшей)"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float], kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.kind = kind
+
+    def collect(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} callback failed: {e}")
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", f"{self.name} {value:g}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Histogram:
+        return self.register(Histogram(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float], kind: str = "gauge"):
+        return self.register(CallbackGauge(name, documentation, callback, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+UPDATE_SECONDS = registry.histogram(
+    "bot_update_seconds", "Полное время обработки апдейта", ("event", "router", "handler")
+)
+UPDATE_ERRORS = registry.counter(
+    "bot_update_errors_total", "Апдейты, обработка которых упала с исключением", ("event", "router", "handler")
+)
+DB_QUERY_SECONDS = registry.histogram("bot_db_query_seconds", "Время SQL-запроса", ("operation",))
+DB_ERRORS = registry.counter("bot_db_errors_total", "Ошибки SQL-запросов", ("operation",))
+AI_SECONDS = registry.histogram("bot_ai_seconds", "Запросы к Mistral AI, с ожиданием очереди и повторами", ("call",))
+AI_ERRORS = registry.counter("bot_ai_errors_total", "Неудачные запросы к Mistral AI", ("call",))
+RENDER_SECONDS = registry.histogram("bot_render_seconds", "Рендер изображений, включая ожидание пула", ("kind",))
+RENDER_POOL_RESTARTS = registry.counter("bot_render_pool_restarts_total", "Пересоздания пула рендера после падения процесса")
+BROADCAST_SEND_SECONDS = registry.histogram("bot_broadcast_send_seconds", "Отправка одного напоминания", ("result",))
+
+
+def timed(histogram: Histogram, *labels: str):
+    """Декоратор: время вызова функции (обычной или async) в гистограмму"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time(*labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(*labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return word if word in ("select", "insert", "update", "delete", "pragma", "with") else "other"
+
+
+def instrument_engine(sync_engine):
+    """Время каждого запроса по событиям движка; метка — только тип запроса, чтобы рядов было немного"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - started, _operation(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        DB_ERRORS.inc(_operation(context.statement or ""))
+
+
+class MetricsServer:
+    """Локальный HTTP с /metrics в текстовом формате Prometheus"""
+
+    def __init__(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8",
+                            headers={"X-Content-Type-Options": "nosniff"})
+
+    async def start(self):
+        if not self.port or self._runner is not None:
+            return
+        app = web.Application()
+        app.router.add_get("/metrics", self.handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logger.info(f"Metrics endpoint on http://{self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+metrics_server = MetricsServer()
@@ -0,0 +1,58 @@
+import time
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from metrics import UPDATE_SECONDS, UPDATE_ERRORS
+
+UNHANDLED = ("-", "unhandled")
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Время обработки апдейта целиком, с меткой обработчика, который его принял.
+
+    Внешний middleware не знает, какой обработчик сработает, поэтому кладёт
+    в data пустой список; HandlerLabelMiddleware на уровне событий записывает
+    туда роутер и имя функции. data копируется при передаче вниз, а список —
+    общий объект.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        route = []
+        data["metrics_route"] = route
+        event_type = event.event_type if isinstance(event, Update) else type(event).__name__
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await handler(event, data)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            labels = (event_type, *(route[0] if route else UNHANDLED))
+            UPDATE_SECONDS.observe(time.perf_counter() - started, *labels)
+            if failed:
+                UPDATE_ERRORS.inc(*labels)
+
+
+class HandlerLabelMiddleware(BaseMiddleware):
+    """Запоминает, какой обработчик выбран для события — для метки в MetricsMiddleware"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        route = data.get("metrics_route")
+        handler_object = data.get("handler")
+        if route is not None and handler_object is not None:
+            callback = handler_object.callback
+            route.append((callback.__module__, callback.__name__))
+        return await handler(event, data)
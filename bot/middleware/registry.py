@@ -0,0 +1,21 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from registry import user_registry
+
+
+class RegistryMiddleware(BaseMiddleware):
+    """Отмечает last_seen пользователя на каждом апдейте (запись в БД — пакетом)"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        user = data.get("event_from_user")
+        if user is not None:
+            user_registry.touch(user.id)
+        return await handler(event, data)
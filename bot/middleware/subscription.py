@@ -6,6 +6,7 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.types import ErrorEvent
 
 from config import CHANNEL_ID, CHANNEL_USERNAME
+from subscription_cache import subscription_cache
 
 logger = logging.getLogger(__name__)
 
@@ -40,12 +41,14 @@ class SubscriptionMiddleware(BaseMiddleware):
         else:
             return await handler(event, data)
 
+        # Кнопка «Я подписался» — повод перепроверить, а не верить кэшу
+        if isinstance(event, CallbackQuery) and event.data == "check_subscription":
+            subscription_cache.invalidate(user_id)
+
         # Проверяем подписку
         try:
             logger.debug(f"Checking subscription for user {user_id} in channel {CHANNEL_ID}")
-            member = await bot.get_chat_member(CHANNEL_ID, user_id)
-            logger.debug(f"User {user_id} status: {member.status}")
-            is_subscribed = member.status in ["member", "administrator", "creator"]
+            is_subscribed = await subscription_cache.is_subscribed(bot, user_id)
             
             if not is_subscribed:
                 # Пользователь не подписан - показываем сообщение с кнопкой подписки
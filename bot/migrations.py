@@ -0,0 +1,74 @@
+import logging
+
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.sqlite import insert
+
+from moods import MOODS, MOOD_LABELS, DEFAULT_MOOD_CODE
+
+logger = logging.getLogger(__name__)
+
+
+def _columns(conn, table: str) -> set:
+    inspector = inspect(conn)
+    if not inspector.has_table(table):
+        return set()
+    return {column["name"] for column in inspector.get_columns(table)}
+
+
+def seed_moods(conn):
+    from models import Mood
+
+    stmt = insert(Mood).on_conflict_do_nothing()
+    conn.execute(stmt, [
+        {"code": code, "emoji": emoji, "name": name} for code, (emoji, name) in MOODS.items()
+    ])
+
+
+def migrate_mood_codes(conn) -> bool:
+    """Переводит mood_entries со строкового mood на mood_code.
+
+    SQLite не умеет менять тип колонки, поэтому таблица пересобирается в
+    том же файле: старая переименовывается, её индексы удаляются, новая
+    создаётся по модели (с составным индексом), данные переливаются одним
+    INSERT ... SELECT с CASE по подписи и старая таблица удаляется. Всё в
+    одной транзакции — при ошибке база остаётся в старой схеме.
+    """
+    columns = _columns(conn, "mood_entries")
+    if "mood" not in columns or "mood_code" in columns:
+        return False
+
+    from models import Mood, MoodEntry
+
+    logger.info("Migrating mood_entries to integer mood codes...")
+
+    old_indexes = [index["name"] for index in inspect(conn).get_indexes("mood_entries")]
+    conn.exec_driver_sql("ALTER TABLE mood_entries RENAME TO mood_entries_legacy")
+    for name in old_indexes:
+        conn.exec_driver_sql(f'DROP INDEX IF EXISTS "{name}"')
+
+    Mood.__table__.create(conn, checkfirst=True)
+    seed_moods(conn)
+    MoodEntry.__table__.create(conn)
+
+    cases = " ".join(
+        f"WHEN :label_{code} THEN {code}" for code in MOOD_LABELS
+    )
+    params = {f"label_{code}": label for code, label in MOOD_LABELS.items()}
+    conn.execute(
+        text(
+            "INSERT INTO mood_entries (id, user_id, mood_code, text, created_at) "
+            f"SELECT id, user_id, CASE mood {cases} ELSE {DEFAULT_MOOD_CODE} END, text, created_at "
+            "FROM mood_entries_legacy"
+        ),
+        params,
+    )
+    migrated = conn.exec_driver_sql("SELECT COUNT(*) FROM mood_entries").scalar()
+    conn.exec_driver_sql("DROP TABLE mood_entries_legacy")
+
+    logger.info(f"Migrated {migrated} mood entries to integer mood codes")
+    return True
+
+
+def run_migrations(conn):
+    """Миграции, которые нельзя выразить добавлением nullable-колонки"""
+    migrate_mood_codes(conn)
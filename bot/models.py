@@ -1,15 +1,123 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime
+from sqlalchemy import Column, Integer, SmallInteger, BigInteger, String, Text, Date, DateTime, Index, ForeignKey
 
 from database import Base
+from moods import mood_label, mood_code
+
+
+class Mood(Base):
+    """Справочник настроений: в записях хранится только код"""
+    __tablename__ = "moods"
+
+    code = Column(SmallInteger, primary_key=True, autoincrement=False)
+    emoji = Column(String(8), nullable=False)
+    name = Column(String(32), nullable=False)
 
 
 class MoodEntry(Base):
     __tablename__ = "mood_entries"
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(BigInteger, nullable=False, index=True)
-    mood = Column(String, nullable=False)
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    mood_code = Column(SmallInteger, ForeignKey("moods.code"), nullable=False)
     text = Column(Text, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    # Дата записи в часовом поясе пользователя на момент записи
+    local_date = Column(Date)
+
+    __table_args__ = (
+        # Все запросы к записям: «пользователь + диапазон/сортировка по времени»
+        Index("ix_mood_entries_user_id_created_at", "user_id", "created_at"),
+        # Просмотр дня и календарь: точный поиск по локальной дате, внутри дня — уже по времени
+        Index("ix_mood_entries_user_id_local_date", "user_id", "local_date", "created_at"),
+        # /stats: распределение настроений за последние дни читается из индекса, без таблицы
+        Index("ix_mood_entries_local_date_mood_code", "local_date", "mood_code"),
+    )
+
+    @property
+    def mood(self) -> str:
+        """Полная подпись вида «😄 Отличное» для вывода пользователю"""
+        return mood_label(self.mood_code)
+
+    @mood.setter
+    def mood(self, label: str):
+        self.mood_code = mood_code(label)
+
+
+class DailyMood(Base):
+    """Дневной агрегат записей пользователя по его локальной дате.
+
+    Обновляется в той же транзакции, что и вставка MoodEntry, поэтому
+    графику и аналитике хватает одной строки на день.
+    """
+    __tablename__ = "daily_mood"
+
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    local_date = Column(Date, primary_key=True)
+    entry_count = Column(Integer, nullable=False)
+    mood_sum = Column(Integer, nullable=False)
+    mood_min = Column(SmallInteger, nullable=False)
+    mood_max = Column(SmallInteger, nullable=False)
+    last_mood_code = Column(SmallInteger, nullable=False)
+    last_entry_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # /stats: активные пользователи и записи по дням — диапазон по дате, покрывающий индекс
+        Index("ix_daily_mood_local_date", "local_date", "user_id", "entry_count", "mood_sum"),
+    )
+
+    @property
+    def average(self) -> float:
+        return self.mood_sum / self.entry_count
+
+
+class ReminderDaily(Base):
+    """Сколько напоминаний отправлено за день (UTC) и сколько из них закончились записью"""
+    __tablename__ = "reminder_daily"
+
+    day = Column(Date, primary_key=True)
+    sent = Column(Integer, nullable=False, default=0)
+    converted = Column(Integer, nullable=False, default=0)
+
+
+class TelegramFile(Base):
+    """Соответствие хэша содержимого картинки и file_id, выданного Telegram"""
+    __tablename__ = "telegram_files"
+
+    content_hash = Column(String(64), primary_key=True)
+    file_id = Column(String, nullable=False)
+    kind = Column(String(16), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Обрезка таблицы по возрасту: самые старые file_id ищутся по индексу
+        Index("ix_telegram_files_created_at", "created_at"),
+    )
+
+
+USER_ACTIVE = "active"
+USER_INACTIVE = "inactive"
+
+
+class User(Base):
+    """Реестр подписчиков рассылки, переживает перезапуски бота"""
+    __tablename__ = "users"
+
+    user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    status = Column(String(16), nullable=False, default=USER_ACTIVE)
+    last_seen = Column(DateTime, default=datetime.utcnow)
+    reminder_time = Column(String(5), nullable=True)
+    timezone = Column(String(64), nullable=True)
+    # Ближайшее напоминание в UTC с точностью до минуты
+    next_fire_at = Column(DateTime, nullable=True)
+    # Последнее отправленное напоминание, пока на него не ответили записью
+    last_reminded_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Рассылка идёт по активным пользователям страницами по user_id
+        Index("ix_users_status_user_id", "status", "user_id"),
+        # Минутный тик забирает только своё «ведро» напоминаний
+        Index("ix_users_status_next_fire_at", "status", "next_fire_at"),
+    )
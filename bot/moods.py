@@ -0,0 +1,30 @@
+from typing import Optional
+
+# Код настроения совпадает с его значением на графике: 1 — очень плохое, 5 — отличное
+MOODS = {
+    5: ("😄", "Отличное"),
+    4: ("🙂", "Хорошее"),
+    3: ("😐", "Нормальное"),
+    2: ("😔", "Плохое"),
+    1: ("😢", "Очень плохое"),
+}
+
+DEFAULT_MOOD_CODE = 3
+
+MOOD_LABELS = {code: f"{emoji} {name}" for code, (emoji, name) in MOODS.items()}
+MOOD_CODES = {label: code for code, label in MOOD_LABELS.items()}
+
+# Порядок кнопок на клавиатуре: от лучшего к худшему
+MOOD_OPTIONS = [MOOD_LABELS[code] for code in sorted(MOODS, reverse=True)]
+
+
+def mood_code(label: str) -> Optional[int]:
+    return MOOD_CODES.get(label)
+
+
+def mood_label(code: int) -> str:
+    return MOOD_LABELS.get(code, MOOD_LABELS[DEFAULT_MOOD_CODE])
+
+
+def mood_emoji(code: int) -> str:
+    return MOODS.get(code, MOODS[DEFAULT_MOOD_CODE])[0]
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select, update, func, literal
+from sqlalchemy.dialects.sqlite import insert
+
+from config import REGISTRY_FLUSH_INTERVAL, REGISTRY_BATCH_SIZE
+from database import async_session
+from models import User, MoodEntry, USER_ACTIVE, USER_INACTIVE
+from reminders import compute_next_fire, current_minute
+
+logger = logging.getLogger(__name__)
+
+
+class UserRegistry:
+    """Персистентный реестр подписчиков с отложенной пакетной записью.
+
+    add_user/remove_user/touch только кладут изменение в словарь в памяти,
+    фоновая задача раз в REGISTRY_FLUSH_INTERVAL секунд записывает всё
+    накопленное: смену статуса — upsert, last_seen — UPDATE по списку id.
+    Сколько бы апдейтов ни пришло от одного пользователя между сбросами,
+    в БД уйдёт одна строка. Строки заводят только add_user/remove_user.
+
+    Реестр только пишет: кому пора напомнить, выбирает
+    reminders.claim_due_users по индексу next_fire_at.
+    """
+
+    def __init__(self, flush_interval: float = REGISTRY_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending: Dict[int, Tuple[Optional[str], datetime]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+    def add_user(self, user_id: int):
+        self._pending[user_id] = (USER_ACTIVE, datetime.utcnow())
+
+    def remove_user(self, user_id: int):
+        self._pending[user_id] = (USER_INACTIVE, datetime.utcnow())
+
+    def drop_pending_status(self, user_id: int):
+        """Перед прямой записью статуса в БД: несброшенный add_user/remove_user её бы перетёр"""
+        pending = self._pending.get(user_id)
+        if pending is not None and pending[0] is not None:
+            self._pending[user_id] = (None, pending[1])
+
+    def touch(self, user_id: int):
+        """Обновляет last_seen, не меняя статус; незнакомого пользователя не заводит"""
+        status, _ = self._pending.get(user_id, (None, None))
+        self._pending[user_id] = (status, datetime.utcnow())
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+            # touch() только обновляет last_seen уже известных пользователей: строки
+            # заводят лишь add_user/remove_user. Иначе подписчиком стал бы любой, кто
+            # прислал апдейт, не нажав /start (например, участник канала)
+            # Новым пользователям — напоминание по умолчанию, у существующих next_fire_at не трогаем
+            default_next_fire = compute_next_fire(None, None, current_minute())
+            touched_at = max(last_seen for _, last_seen in pending.values())
+            touched = []
+            changed = []
+            for user_id, (status, last_seen) in pending.items():
+                if status is None:
+                    touched.append(user_id)
+                else:
+                    changed.append({
+                        "user_id": user_id,
+                        "status": status,
+                        "last_seen": last_seen,
+                        "next_fire_at": default_next_fire,
+                    })
+
+            status_stmt = insert(User)
+            status_stmt = status_stmt.on_conflict_do_update(
+                index_elements=[User.user_id],
+                set_={
+                    "status": status_stmt.excluded.status,
+                    "last_seen": status_stmt.excluded.last_seen,
+                    "next_fire_at": func.coalesce(User.next_fire_at, status_stmt.excluded.next_fire_at),
+                },
+            )
+
+            try:
+                async with async_session() as db:
+                    # Неизвестные id просто не попадут под WHERE; точность last_seen — интервал сброса
+                    for start in range(0, len(touched), REGISTRY_BATCH_SIZE):
+                        chunk = touched[start:start + REGISTRY_BATCH_SIZE]
+                        await db.execute(
+                            update(User).where(User.user_id.in_(chunk)).values(last_seen=touched_at)
+                        )
+                    if changed:
+                        await db.execute(status_stmt, changed)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Failed to flush {len(pending)} registry updates: {e}")
+                # Возвращаем изменения, не затирая более свежие
+                for user_id, value in pending.items():
+                    self._pending.setdefault(user_id, value)
+                return
+
+            logger.debug(f"Flushed {len(pending)} registry updates")
+
+    async def seed_from_entries(self):
+        """Первый запуск: переносим в реестр всех, у кого уже есть записи"""
+        async with async_session() as db:
+            if await db.scalar(select(func.count()).select_from(User)):
+                return
+            stmt = insert(User).from_select(
+                ["user_id", "status", "last_seen"],
+                select(MoodEntry.user_id, literal(USER_ACTIVE), func.max(MoodEntry.created_at))
+                .group_by(MoodEntry.user_id),
+            )
+            result = await db.execute(stmt)
+            await db.commit()
+        logger.info(f"Seeded user registry with {result.rowcount} users from mood entries")
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        await self.seed_from_entries()
+        if self._task is None:
+            self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+
+user_registry = UserRegistry()
+
+
+def add_user(user_id: int):
+    user_registry.add_user(user_id)
@@ -0,0 +1,157 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select, update
+
+from config import TIMEZONE, MOOD_CHECK_TIME, REMINDER_GRACE_MINUTES, REGISTRY_BATCH_SIZE
+from database import async_session
+from models import User, USER_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+TIME_FORMAT = "%H:%M"
+
+
+def parse_reminder_time(value: str) -> Optional[tuple]:
+    try:
+        parsed = datetime.strptime(value.strip(), TIME_FORMAT)
+    except ValueError:
+        return None
+    return parsed.hour, parsed.minute
+
+
+def get_zone(tz_name: Optional[str]) -> ZoneInfo:
+    try:
+        return ZoneInfo(tz_name or TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(TIMEZONE)
+
+
+def compute_next_fire(
+    reminder_time: Optional[str],
+    tz_name: Optional[str],
+    after: datetime,
+) -> datetime:
+    """Ближайший момент после ``after`` (naive UTC), когда у пользователя наступает reminder_time.
+
+    Считается от локальной даты пользователя, поэтому переходы на летнее
+    время учитываются автоматически при каждом пересчёте.
+    """
+    hour, minute = parse_reminder_time(reminder_time or MOOD_CHECK_TIME) or parse_reminder_time(MOOD_CHECK_TIME)
+    zone = get_zone(tz_name)
+
+    local_now = after.replace(tzinfo=timezone.utc).astimezone(zone)
+    candidate_date = local_now.date()
+    while True:
+        local_fire = datetime(
+            candidate_date.year, candidate_date.month, candidate_date.day, hour, minute, tzinfo=zone
+        )
+        fire_utc = local_fire.astimezone(timezone.utc).replace(tzinfo=None)
+        if fire_utc > after:
+            return fire_utc
+        candidate_date += timedelta(days=1)
+
+
+def current_minute() -> datetime:
+    return datetime.utcnow().replace(second=0, microsecond=0)
+
+
+async def backfill_next_fire(batch_size: int = REGISTRY_BATCH_SIZE) -> int:
+    """Проставляет next_fire_at пользователям, у которых его ещё нет"""
+    now = current_minute()
+    total = 0
+    while True:
+        async with async_session() as db:
+            rows = (
+                await db.execute(
+                    select(User.user_id, User.reminder_time, User.timezone)
+                    .where(User.next_fire_at.is_(None))
+                    .limit(batch_size)
+                )
+            ).all()
+            if not rows:
+                break
+            await db.execute(
+                update(User),
+                [
+                    {"user_id": row.user_id,
+                     "next_fire_at": compute_next_fire(row.reminder_time, row.timezone, now)}
+                    for row in rows
+                ],
+            )
+            await db.commit()
+        total += len(rows)
+    if total:
+        logger.info(f"Backfilled next reminder time for {total} users")
+    return total
+
+
+async def claim_due_users(now: datetime, batch_size: int = REGISTRY_BATCH_SIZE) -> AsyncIterator[int]:
+    """Забирает «ведро» пользователей, чьё напоминание наступило к минуте ``now``.
+
+    next_fire_at переносится на следующий день до отправки, поэтому
+    повторный тик или падение посреди рассылки не приведут к дублям.
+    Просроченные дольше REMINDER_GRACE_MINUTES только переносятся.
+    Пропуск к базе берётся только на запросы пачки: пока получатели
+    отдаются рассылке, замена базы может пройти.
+    """
+    grace_start = now - timedelta(minutes=REMINDER_GRACE_MINUTES)
+    while True:
+        async with async_session() as db:
+            rows = (
+                await db.execute(
+                    select(User.user_id, User.reminder_time, User.timezone, User.next_fire_at)
+                    .where(User.status == USER_ACTIVE, User.next_fire_at <= now)
+                    .order_by(User.next_fire_at)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not rows:
+                return
+            await db.execute(
+                update(User),
+                [
+                    {"user_id": row.user_id,
+                     "next_fire_at": compute_next_fire(row.reminder_time, row.timezone, now),
+                     "last_reminded_at": row.next_fire_at if row.next_fire_at >= grace_start else None}
+                    for row in rows
+                ],
+            )
+            await db.commit()
+
+        for row in rows:
+            if row.next_fire_at >= grace_start:
+                yield row.user_id
+
+
+async def update_reminder_settings(
+    user_id: int,
+    reminder_time: Optional[str] = None,
+    tz_name: Optional[str] = None,
+    status: Optional[str] = None,
+) -> User:
+    if status is not None:
+        # Импорт здесь: registry сам зависит от reminders
+        from registry import user_registry
+        user_registry.drop_pending_status(user_id)
+    async with async_session() as db:
+        user = await db.get(User, user_id)
+        if user is None:
+            user = User(user_id=user_id, status=USER_ACTIVE, last_seen=datetime.utcnow())
+            db.add(user)
+        if reminder_time is not None:
+            user.reminder_time = reminder_time
+        if tz_name is not None:
+            user.timezone = tz_name
+        if status is not None:
+            user.status = status
+        user.next_fire_at = compute_next_fire(user.reminder_time, user.timezone, current_minute())
+        await db.commit()
+        return user
+
+
+async def get_reminder_settings(user_id: int) -> Optional[User]:
+    async with async_session() as db:
+        return await db.get(User, user_id)
@@ -0,0 +1,102 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from config import RENDER_WORKERS, RENDER_QUEUE_SIZE
+from metrics import RENDER_POOL_RESTARTS, registry
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPoolBusy(Exception):
+    """Очередь рендера переполнена — запрос отклонён"""
+
+
+def _warmup_worker():
+    # Импорт движка рендера один раз при старте процесса, а не на первом графике
+    import graph_service
+    graph_service.warmup()
+
+
+def _noop():
+    return None
+
+
+class RenderPool:
+    """Пул процессов для CPU-тяжёлого рендера с ограниченной очередью.
+
+    Одновременно выполняется не больше ``workers`` задач, ещё ``max_queue``
+    ждут своей очереди; остальные сразу получают RenderPoolBusy, чтобы
+    всплеск нажатий не копил бесконечный хвост работы.
+
+    Если процесс пула умер (OOM, падение в matplotlib), ProcessPoolExecutor
+    сломан навсегда: пул пересоздаётся, а задача повторяется один раз.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS, max_queue: int = RENDER_QUEUE_SIZE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+
+    def start(self):
+        if self._executor is not None:
+            return
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warmup_worker,
+        )
+        # Поднимаем все процессы сразу, чтобы прогрев прошёл до первого запроса
+        for _ in range(self.workers):
+            self._executor.submit(_noop)
+        logger.info(f"Render pool started: {self.workers} workers, queue {self.max_queue}")
+
+    def stop(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Render pool stopped")
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        if self._pending >= self.workers + self.max_queue:
+            raise RenderPoolBusy(f"{self._pending} renders in flight")
+
+        if self._executor is None:
+            self.start()
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            for attempt in range(2):
+                executor = self._executor
+                try:
+                    return await loop.run_in_executor(executor, func, *args)
+                except BrokenProcessPool:
+                    # Следующий запрос получит живой пул, даже если повтор снова уронил процесс
+                    self._restart(executor)
+                    if attempt:
+                        raise
+        finally:
+            self._pending -= 1
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        # Упавшие одновременно задачи пересоздают пул один раз
+        if self._executor is not broken:
+            return
+        logger.error("Render pool worker died, restarting the pool")
+        RENDER_POOL_RESTARTS.inc()
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.start()
+
+
+render_pool = RenderPool()
+registry.gauge("bot_render_pending", "Рендеры в работе и в очереди пула", lambda: render_pool.pending)
@@ -0,0 +1,239 @@
+import logging
+import time
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, update, func, case
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import REGISTRY_BATCH_SIZE
+from database import async_session
+from calendar_cache import calendar_cache
+from graph_cache import graph_cache
+from models import DailyMood, MoodEntry, User
+from reminders import get_zone
+
+logger = logging.getLogger(__name__)
+
+
+def local_date(created_at: datetime, tz_name: Optional[str]) -> date:
+    """Календарная дата записи (created_at — naive UTC) в часовом поясе пользователя"""
+    return created_at.replace(tzinfo=timezone.utc).astimezone(get_zone(tz_name)).date()
+
+
+def _merge_stmt():
+    """Upsert, который складывает агрегаты с уже накопленными за этот день.
+
+    В DO UPDATE правые части видят старую строку, поэтому min/max/последнее
+    настроение считаются по обеим сторонам без повторного чтения.
+    """
+    stmt = insert(DailyMood)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[DailyMood.user_id, DailyMood.local_date],
+        set_={
+            "entry_count": DailyMood.entry_count + excluded.entry_count,
+            "mood_sum": DailyMood.mood_sum + excluded.mood_sum,
+            "mood_min": func.min(DailyMood.mood_min, excluded.mood_min),
+            "mood_max": func.max(DailyMood.mood_max, excluded.mood_max),
+            "last_mood_code": case(
+                (excluded.last_entry_at >= DailyMood.last_entry_at, excluded.last_mood_code),
+                else_=DailyMood.last_mood_code,
+            ),
+            "last_entry_at": func.max(DailyMood.last_entry_at, excluded.last_entry_at),
+        },
+    )
+
+
+def _entry_row(user_id: int, day: date, code: int, created_at: datetime) -> dict:
+    return {
+        "user_id": user_id,
+        "local_date": day,
+        "entry_count": 1,
+        "mood_sum": code,
+        "mood_min": code,
+        "mood_max": code,
+        "last_mood_code": code,
+        "last_entry_at": created_at,
+    }
+
+
+def _fold(row: dict, code: int, created_at: datetime):
+    row["entry_count"] += 1
+    row["mood_sum"] += code
+    row["mood_min"] = min(row["mood_min"], code)
+    row["mood_max"] = max(row["mood_max"], code)
+    if created_at >= row["last_entry_at"]:
+        row["last_mood_code"] = code
+        row["last_entry_at"] = created_at
+
+
+async def record_entry(db: AsyncSession, entry: MoodEntry):
+    """Добавляет запись (с уже заполненным local_date) в дневной агрегат. Коммит — на стороне вызывающего"""
+    row = _entry_row(entry.user_id, entry.local_date, entry.mood_code, entry.created_at)
+    await db.execute(_merge_stmt(), [row])
+
+
+async def get_user_timezone(db: AsyncSession, user_id: int) -> Optional[str]:
+    return await db.scalar(select(User.timezone).where(User.user_id == user_id))
+
+
+async def month_marks(db: AsyncSession, user_id: int, year: int, month: int) -> Dict[int, int]:
+    """Дни месяца с записями и их среднее настроение (округлённый код) — один запрос"""
+    first = date(year, month, 1)
+    after = date(year + month // 12, month % 12 + 1, 1)
+    rows = (
+        await db.execute(
+            select(DailyMood.local_date, DailyMood.mood_sum, DailyMood.entry_count)
+            .where(
+                DailyMood.user_id == user_id,
+                DailyMood.local_date >= first,
+                DailyMood.local_date < after,
+            )
+        )
+    ).all()
+    return {day.day: round(mood_sum / entry_count) for day, mood_sum, entry_count in rows}
+
+
+# Начало корзины в SQLite: сам день, понедельник его недели или первое число месяца
+BUCKETS = {
+    "day": lambda column: func.date(column),
+    "week": lambda column: func.date(column, "-6 days", "weekday 1"),
+    "month": lambda column: func.date(column, "start of month"),
+}
+
+
+async def first_day(db: AsyncSession, user_id: int) -> Optional[date]:
+    return await db.scalar(select(func.min(DailyMood.local_date)).where(DailyMood.user_id == user_id))
+
+
+async def bucketed_days(
+    db: AsyncSession,
+    user_id: int,
+    since: Optional[date],
+    bucket: str,
+) -> List[Tuple[datetime, float]]:
+    """Среднее настроение по корзинам (день/неделя/месяц) начиная с ``since``.
+
+    Группировка идёт в SQL по дневным агрегатам, поэтому в Python приходит
+    не больше строк, чем корзин, сколько бы лет истории ни было.
+    """
+    bucket_start = BUCKETS[bucket](DailyMood.local_date).label("bucket")
+    stmt = (
+        select(bucket_start, func.sum(DailyMood.mood_sum), func.sum(DailyMood.entry_count))
+        .where(DailyMood.user_id == user_id)
+        .group_by(bucket_start)
+        .order_by(bucket_start)
+    )
+    if since is not None:
+        stmt = stmt.where(DailyMood.local_date >= since)
+
+    rows = (await db.execute(stmt)).all()
+    return [
+        (datetime.strptime(start, "%Y-%m-%d"), mood_sum / entry_count)
+        for start, mood_sum, entry_count in rows
+    ]
+
+
+async def rebuild_daily_mood(batch_size: int = REGISTRY_BATCH_SIZE) -> int:
+    """Пересчитывает daily_mood с нуля по всем записям.
+
+    Очистка агрегата и чтение наибольшего id записи идут одной короткой
+    транзакцией. Записи до этого id читаются страницами и сворачиваются в
+    памяти по (пользователь, local_date); каждая страница — отдельный upsert
+    со своим коммитом, так что база не занята записью на весь пересчёт.
+    Записи, добавленные после очистки, process_text уже сложил в агрегат
+    сам, а upsert досуммирует к ним пересчитанное — ничего не теряется и
+    не считается дважды. Пока пересчёт идёт, агрегат за старые дни неполон.
+    """
+    started = time.monotonic()
+    entries = 0
+    await backfill_local_dates(batch_size)
+    async with async_session() as db:
+        await db.execute(delete(DailyMood))
+        high_water = await db.scalar(select(func.max(MoodEntry.id))) or 0
+        await db.commit()
+
+    last_id = 0
+    while last_id < high_water:
+        async with async_session() as db:
+            rows = (
+                await db.execute(
+                    select(MoodEntry.id, MoodEntry.user_id, MoodEntry.mood_code,
+                           MoodEntry.created_at, MoodEntry.local_date)
+                    .where(MoodEntry.id > last_id, MoodEntry.id <= high_water)
+                    .order_by(MoodEntry.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not rows:
+                break
+
+            days: Dict[Tuple[int, date], dict] = {}
+            for row in rows:
+                day = row.local_date
+                aggregate = days.get((row.user_id, day))
+                if aggregate is None:
+                    days[(row.user_id, day)] = _entry_row(row.user_id, day, row.mood_code, row.created_at)
+                else:
+                    _fold(aggregate, row.mood_code, row.created_at)
+            await db.execute(_merge_stmt(), list(days.values()))
+            await db.commit()
+
+        entries += len(rows)
+        last_id = rows[-1].id
+    calendar_cache.clear()
+    await graph_cache.clear()
+
+    logger.info(f"Rebuilt daily mood rollup from {entries} entries in {time.monotonic() - started:.1f}s")
+    return entries
+
+
+async def backfill_local_dates(batch_size: int = REGISTRY_BATCH_SIZE) -> int:
+    """Заполняет local_date у записей, сделанных до появления колонки.
+
+    Дата считается по текущему часовому поясу пользователя — другого у
+    старых записей нет.
+    """
+    total = 0
+    last_id = 0
+    async with async_session() as db:
+        timezones = dict(
+            (await db.execute(select(User.user_id, User.timezone).where(User.timezone.is_not(None)))).all()
+        )
+    while True:
+        async with async_session() as db:
+            rows = (
+                await db.execute(
+                    select(MoodEntry.id, MoodEntry.user_id, MoodEntry.created_at)
+                    .where(MoodEntry.id > last_id, MoodEntry.local_date.is_(None))
+                    .order_by(MoodEntry.id)
+                    .limit(batch_size)
+                )
+            ).all()
+            if not rows:
+                break
+            await db.execute(
+                update(MoodEntry),
+                [
+                    {"id": row.id, "local_date": local_date(row.created_at, timezones.get(row.user_id))}
+                    for row in rows
+                ],
+            )
+            await db.commit()
+        total += len(rows)
+        last_id = rows[-1].id
+    if total:
+        logger.info(f"Backfilled local date for {total} mood entries")
+    return total
+
+
+async def backfill_daily_mood() -> int:
+    """Первый запуск после обновления: строим агрегат, если он пуст, а записи есть"""
+    async with async_session() as db:
+        if await db.scalar(select(DailyMood.user_id).limit(1)) is not None:
+            return 0
+        if await db.scalar(select(MoodEntry.id).limit(1)) is None:
+            return 0
+    return await rebuild_daily_mood()
@@ -1,44 +1,55 @@
 import logging
-from datetime import datetime
 from zoneinfo import ZoneInfo
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
-from config import TIMEZONE, MOOD_CHECK_TIME
+from config import TIMEZONE, SNAPSHOT_INTERVAL_HOURS
 from keyboards import get_main_menu
+from broadcast import Broadcaster
+from registry import user_registry
+from reminders import claim_due_users, current_minute
+from snapshots import snapshot_manager
+from stats import record_reminders_sent
 
 logger = logging.getLogger(__name__)
 
-# Хранилище ID пользователей для рассылки
-active_users = set()
 
+class MoodScheduler:
+    """Один минутный тик вместо задачи на каждого пользователя.
 
-def add_user(user_id: int):
-    active_users.add(user_id)
-
-
-def remove_user(user_id: int):
-    active_users.discard(user_id)
-
+    Пользователи проиндексированы по next_fire_at (UTC, с точностью до
+    минуты); тик забирает только наступившее «ведро», отдаёт его рассылке
+    и тут же переносит каждому следующее напоминание.
+    """
 
-class MoodScheduler:
     def __init__(self):
         self.scheduler = AsyncIOScheduler(timezone=ZoneInfo(TIMEZONE))
         self._job_added = False
 
     def start(self):
         if not self._job_added:
-            hour, minute = map(int, MOOD_CHECK_TIME.split(":"))
             self.scheduler.add_job(
                 self._send_mood_check,
-                CronTrigger(hour=hour, minute=minute),
-                id="daily_mood_check",
+                CronTrigger(second=0),
+                id="mood_check_tick",
                 replace_existing=True,
+                max_instances=1,
+                coalesce=True,
             )
+            if SNAPSHOT_INTERVAL_HOURS > 0:
+                self.scheduler.add_job(
+                    snapshot_manager.scheduled,
+                    IntervalTrigger(hours=SNAPSHOT_INTERVAL_HOURS),
+                    id="db_snapshot",
+                    replace_existing=True,
+                    max_instances=1,
+                    coalesce=True,
+                )
             self._job_added = True
         self.scheduler.start()
-        logger.info(f"Scheduled daily mood check at {MOOD_CHECK_TIME} {TIMEZONE}")
+        logger.info("Scheduled per-minute mood check tick")
 
     def stop(self):
         self.scheduler.shutdown()
@@ -47,27 +58,33 @@ class MoodScheduler:
     async def _send_mood_check(self):
         from main import bot
 
-        count = 0
-        errors = 0
+        async def send(user_id: int):
+            await bot.send_message(
+                chat_id=user_id,
+                text="Как прошло твоё настроение сегодня? 🌟\n\n"
+                     "Пару минут рефлексии помогут лучше понять себя.",
+                reply_markup=get_main_menu(),
+            )
 
-        for user_id in list(active_users):
-            try:
-                await bot.send_message(
-                    chat_id=user_id,
-                    text="Как прошло твоё настроение сегодня? 🌟\n\n"
-                         "Пару минут рефлексии помогут лучше понять себя.",
-                    reply_markup=get_main_menu(),
-                )
-                count += 1
-                logger.info(f"Sent mood check to user {user_id}")
-            except Exception as e:
-                errors += 1
-                logger.error(f"Error sending mood check to user {user_id}: {e}")
-                # Если бот заблокирован, удаляем пользователя
-                if "blocked" in str(e).lower():
-                    remove_user(user_id)
-
-        logger.info(f"Daily mood check completed: {count} sent, {errors} errors")
+        # Сначала сбрасываем накопленные /start, чтобы новые пользователи попали в рассылку
+        await user_registry.flush()
+        # Пропуск к базе берут сами запросы, а не вся рассылка: отправка идёт минутами
+        result = await Broadcaster().run(claim_due_users(current_minute()), send)
+        await record_reminders_sent(result.sent)
+
+        if not result.sent and not result.failed:
+            return
+
+        # Заблокировавших бота и удалённые чаты больше не рассылаем
+        for user_id in result.unreachable:
+            user_registry.remove_user(user_id)
+        await user_registry.flush()
+
+        logger.info(
+            f"Mood check tick completed: {result.sent} sent, {result.failed} errors, "
+            f"{len(result.unreachable)} unreachable, {result.retried} retries "
+            f"in {result.duration:.1f}s ({result.throughput:.1f} msg/s)"
+        )
 
 
 scheduler = MoodScheduler()
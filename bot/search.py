@@ -0,0 +1,239 @@
+import logging
+import re
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+
+from database import async_session, db_gate, engine
+
+logger = logging.getLogger(__name__)
+
+# Индекс не хранит копию текста: содержимое читается из mood_entries через
+# представление. owner — служебный токен «u<user_id>», по нему FTS сразу
+# пересекает выдачу с записями пользователя вместо фильтрации после поиска.
+# «ё» приводится к «е», иначе «ежик» не находит «ёжик».
+FTS_TEXT = "replace(replace({0}.text, 'ё', 'е'), 'Ё', 'Е')"
+FTS_OWNER = "'u' || {0}.user_id"
+
+# Префиксные индексы: запрос «прогулка» ищется как «прогул*» по готовому
+# списку документов, без слияния списков всех слов с этим началом
+PREFIX_LENGTHS = (3, 4, 5, 6)
+
+SEARCH_SCHEMA = [
+    f"""CREATE VIEW IF NOT EXISTS mood_entries_fts_source AS
+        SELECT id, {FTS_OWNER.format('mood_entries')} AS owner, {FTS_TEXT.format('mood_entries')} AS text
+        FROM mood_entries""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS mood_entries_fts USING fts5(
+        owner, text,
+        content='mood_entries_fts_source', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='{" ".join(map(str, PREFIX_LENGTHS))}'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS mood_entries_fts_ai AFTER INSERT ON mood_entries BEGIN
+        INSERT INTO mood_entries_fts(rowid, owner, text)
+        VALUES (new.id, {FTS_OWNER.format('new')}, {FTS_TEXT.format('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS mood_entries_fts_ad AFTER DELETE ON mood_entries BEGIN
+        INSERT INTO mood_entries_fts(mood_entries_fts, rowid, owner, text)
+        VALUES ('delete', old.id, {FTS_OWNER.format('old')}, {FTS_TEXT.format('old')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS mood_entries_fts_au AFTER UPDATE OF user_id, text ON mood_entries BEGIN
+        INSERT INTO mood_entries_fts(mood_entries_fts, rowid, owner, text)
+        VALUES ('delete', old.id, {FTS_OWNER.format('old')}, {FTS_TEXT.format('old')});
+        INSERT INTO mood_entries_fts(rowid, owner, text)
+        VALUES (new.id, {FTS_OWNER.format('new')}, {FTS_TEXT.format('new')});
+    END""",
+]
+
+SEARCH_PAGE_SIZE = 5
+# Совпадения ранжируются блоками от свежих к старым — стоимость страницы
+# не растёт с историей, а до старых записей всё равно можно долистать
+SEARCH_CANDIDATES = 500
+# Блок задаётся id, ниже которого он начинается; первый запрос идёт без границы
+NO_BOUND = 2 ** 63 - 1
+MAX_QUERY_WORDS = 8
+# Запрос повторяется в заголовке ответа, фрагмент — на каждый из результатов страницы:
+# вместе они должны укладываться в лимит сообщения Telegram (4096 символов)
+MAX_QUERY_CHARS = 200
+SNIPPET_WORDS = 12
+SNIPPET_CHARS = 300
+WORD_PATTERN = re.compile(r"\w+")
+
+# BM25: насыщение частоты слова и нормализация по длине записи
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+CANDIDATES_SQL = text("""
+    SELECT e.id AS id, e.text AS text, e.local_date AS local_date, e.mood_code AS mood_code
+    FROM mood_entries_fts f
+    JOIN mood_entries e ON e.id = f.rowid
+    WHERE mood_entries_fts MATCH :match AND f.rowid < :top
+    ORDER BY f.rowid DESC
+    LIMIT :limit
+""")
+
+
+@dataclass
+class SearchHit:
+    id: int
+    # Граница блока кандидатов, в котором найдена запись: id < block
+    block: int
+    score: float
+    snippet: str
+    local_date: Optional[date]
+    mood_code: int
+
+
+def ensure_search_index(conn):
+    """Создаёт FTS-индекс и триггеры; у существующей базы сразу наполняет его"""
+    if conn.dialect.name != "sqlite":
+        return
+    created = not inspect(conn).has_table("mood_entries_fts")
+    for statement in SEARCH_SCHEMA:
+        conn.exec_driver_sql(statement)
+    if created:
+        conn.exec_driver_sql("INSERT INTO mood_entries_fts(mood_entries_fts) VALUES ('rebuild')")
+        logger.info("Built full-text search index for mood entries")
+
+
+def normalize(value: str) -> str:
+    return value.lower().replace("ё", "е")
+
+
+def query_stems(query: str) -> List[str]:
+    """Слова запроса, обрезанные до основы длиной из PREFIX_LENGTHS.
+
+    Морфологии в SQLite нет, поэтому у длинных слов отрезаются последние
+    буквы: «работа» -> «рабо», «прогулка» -> «прогул». Короткие ищутся
+    как префикс целиком.
+    """
+    stems = []
+    for word in WORD_PATTERN.findall(normalize(query))[:MAX_QUERY_WORDS]:
+        stem = word if len(word) <= 5 else word[:min(PREFIX_LENGTHS[-1], len(word) - 2)]
+        if stem not in stems:
+            stems.append(stem)
+    return stems
+
+
+def build_match(user_id: int, stems: List[str]) -> str:
+    """Выражение FTS5: слова в кавычках, поэтому операторы из ввода не работают"""
+    terms = " AND ".join(
+        f'text : "{stem}"*' if len(stem) >= PREFIX_LENGTHS[0] else f'text : "{stem}"'
+        for stem in stems
+    )
+    return f'owner : "u{user_id}" AND {terms}'
+
+
+def _matches(token: str, stem: str) -> bool:
+    return token.startswith(stem) if len(stem) >= PREFIX_LENGTHS[0] else token == stem
+
+
+def score_entries(rows, stems: List[str]) -> List[Tuple[float, object]]:
+    """BM25 по совпадениям пользователя.
+
+    Встроенный bm25() FTS5 для IDF проходит по спискам документов слова
+    во всей базе — на частых словах это десятки миллисекунд. Здесь все
+    кандидаты содержат все слова запроса (AND), так что IDF у них общий и
+    порядок определяют только частота слова и длина записи.
+    """
+    tokenized = [WORD_PATTERN.findall(normalize(row.text)) for row in rows]
+    avg_length = sum(len(tokens) for tokens in tokenized) / len(tokenized) if tokenized else 1
+    scored = []
+    for row, tokens in zip(rows, tokenized):
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg_length)
+        score = 0.0
+        for stem in stems:
+            tf = sum(1 for token in tokens if _matches(token, stem))
+            score += tf * (BM25_K1 + 1) / (tf + norm)
+        scored.append((score, row))
+    return scored
+
+
+def make_snippet(value: str, stems: List[str], width: int = SNIPPET_WORDS) -> str:
+    """Окно вокруг первого совпадения, найденные слова в «ёлочках»"""
+    snippet = _window(value, stems, width)
+    return snippet if len(snippet) <= SNIPPET_CHARS else snippet[:SNIPPET_CHARS - 1] + "…"
+
+
+def _window(value: str, stems: List[str], width: int) -> str:
+    words = value.split()
+    hits = [
+        i for i, word in enumerate(words)
+        if any(_matches(token, stem) for token in WORD_PATTERN.findall(normalize(word)) for stem in stems)
+    ]
+    if not hits:
+        return " ".join(words[:width]) + ("…" if len(words) > width else "")
+
+    start = max(0, min(hits[0] - width // 3, len(words) - width))
+    window = words[start:start + width]
+    marked = [f"«{word}»" if start + i in hits else word for i, word in enumerate(window)]
+    prefix = "…" if start > 0 else ""
+    suffix = "…" if start + width < len(words) else ""
+    return prefix + " ".join(marked) + suffix
+
+
+async def search_entries(
+    user_id: int,
+    query: str,
+    after: Optional[Tuple[int, float, int]] = None,
+    limit: int = SEARCH_PAGE_SIZE,
+) -> List[SearchHit]:
+    """Страница результатов: блоки свежих совпадений, внутри блока — по релевантности.
+
+    FTS отдаёт совпадения пользователя блоками по SEARCH_CANDIDATES от
+    новых к старым (ключ — rowid), блок ранжируется в score_entries.
+    ``after`` — (блок, score, id) последнего показанного результата:
+    следующая страница продолжает с него, без OFFSET, а когда блок
+    исчерпан — переходит к следующему, так что достижимо каждое совпадение.
+    Граница первого блока фиксируется по самой свежей записи, поэтому новые
+    записи не сдвигают уже показанные страницы.
+    """
+    stems = query_stems(query)
+    if not stems:
+        return []
+
+    match = build_match(user_id, stems)
+    block = after[0] if after is not None else NO_BOUND
+    hits: List[SearchHit] = []
+    async with async_session() as db:
+        while len(hits) < limit:
+            params = {"match": match, "top": block, "limit": SEARCH_CANDIDATES}
+            rows = (await db.execute(CANDIDATES_SQL, params)).all()
+            if not rows:
+                break
+            if block == NO_BOUND:
+                block = rows[0].id + 1
+
+            ranked = sorted(score_entries(rows, stems), key=lambda item: (item[0], item[1].id), reverse=True)
+            if after is not None and block == after[0]:
+                ranked = [item for item in ranked if (item[0], item[1].id) < after[1:]]
+            hits.extend(
+                SearchHit(
+                    id=row.id,
+                    block=block,
+                    score=score,
+                    snippet=make_snippet(row.text, stems),
+                    local_date=date.fromisoformat(row.local_date) if row.local_date else None,
+                    mood_code=row.mood_code,
+                )
+                for score, row in ranked[:limit - len(hits)]
+            )
+            if len(rows) < SEARCH_CANDIDATES:
+                break
+            block = rows[-1].id
+    return hits
+
+
+async def rebuild_search_index() -> float:
+    """Пересоздаёт индекс с текущими настройками по mood_entries и сливает его сегменты"""
+    started = time.monotonic()
+    async with db_gate.shared(), engine.begin() as conn:
+        await conn.exec_driver_sql("DROP TABLE IF EXISTS mood_entries_fts")
+        await conn.run_sync(ensure_search_index)
+        await conn.exec_driver_sql("INSERT INTO mood_entries_fts(mood_entries_fts) VALUES ('optimize')")
+    duration = time.monotonic() - started
+    logger.info(f"Rebuilt full-text search index in {duration:.1f}s")
+    return duration
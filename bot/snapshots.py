@@ -0,0 +1,166 @@
+import asyncio
+import glob
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List
+
+from aiogram.types.input_file import InputFile
+
+from config import DATABASE_PATH, SNAPSHOT_DIR, SNAPSHOT_KEEP, SNAPSHOT_PAGES, SNAPSHOT_PART_BYTES
+from database import db_gate
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_PREFIX = "mood_tracker-"
+SNAPSHOT_SUFFIX = ".db.gz"
+
+
+@dataclass
+class Snapshot:
+    path: str
+    db_size: int
+    size: int
+    backup_seconds: float
+    compress_seconds: float
+
+    @property
+    def duration(self) -> float:
+        return self.backup_seconds + self.compress_seconds
+
+
+class FilePartInputFile(InputFile):
+    """Отправка куска файла [offset, offset + length) без копирования на диск"""
+
+    def __init__(self, path: str, offset: int, length: int, filename: str):
+        super().__init__(filename=filename)
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+    async def read(self, bot):
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            left = self.length
+            while left > 0:
+                chunk = f.read(min(self.chunk_size, left))
+                if not chunk:
+                    break
+                left -= len(chunk)
+                yield chunk
+
+
+def _backup(source_path: str, target_path: str, pages: int):
+    """Онлайн-копия через backup API SQLite порциями по ``pages`` страниц.
+
+    Если между шагами базу меняет другое соединение, SQLite начинает копию
+    заново — под постоянной записью она может не закончиться никогда. Поэтому
+    на источнике сначала открывается транзакция чтения: в WAL она не мешает
+    писателям, а все шаги читают один и тот же согласованный срез.
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.execute("BEGIN")
+        source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        source.backup(target, pages=pages, sleep=0)
+        source.rollback()
+    finally:
+        target.close()
+        source.close()
+
+
+def _compress(source_path: str, target_path: str):
+    with open(source_path, "rb") as src, gzip.open(target_path, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+
+
+def list_snapshots(directory: str = SNAPSHOT_DIR) -> List[str]:
+    """Снимки в каталоге, от старых к новым (имя содержит время снимка)"""
+    return sorted(glob.glob(os.path.join(directory, f"{SNAPSHOT_PREFIX}*{SNAPSHOT_SUFFIX}")))
+
+
+def rotate(directory: str = SNAPSHOT_DIR, keep: int = SNAPSHOT_KEEP) -> int:
+    """Удаляет всё, кроме ``keep`` последних снимков"""
+    old = list_snapshots(directory)[:-keep] if keep > 0 else []
+    for path in old:
+        os.remove(path)
+    return len(old)
+
+
+def split_parts(path: str, part_bytes: int = SNAPSHOT_PART_BYTES) -> List[FilePartInputFile]:
+    """Файл целиком или части .001, .002… под лимит размера документа Telegram.
+
+    Части склеиваются обратно обычным cat.
+    """
+    size = os.path.getsize(path)
+    name = os.path.basename(path)
+    if size <= part_bytes:
+        return [FilePartInputFile(path, 0, size, name)]
+    return [
+        FilePartInputFile(path, offset, min(part_bytes, size - offset), f"{name}.{number:03d}")
+        for number, offset in enumerate(range(0, size, part_bytes), start=1)
+    ]
+
+
+class SnapshotManager:
+    """Сжатые снимки базы в SNAPSHOT_DIR с ротацией.
+
+    Копия и сжатие идут в потоке; одновременно снимается только один снимок —
+    ручной /download_db и плановый не мешают друг другу.
+    """
+
+    def __init__(self, database_path: str = DATABASE_PATH, directory: str = SNAPSHOT_DIR, keep: int = SNAPSHOT_KEEP):
+        self.database_path = os.path.abspath(database_path)
+        self.directory = directory
+        self.keep = keep
+        self._lock = asyncio.Lock()
+
+    async def take(self) -> Snapshot:
+        async with self._lock:
+            if not os.path.exists(self.database_path):
+                raise FileNotFoundError(self.database_path)
+            os.makedirs(self.directory, exist_ok=True)
+
+            stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+            raw_path = os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{stamp}.db.tmp")
+            path = os.path.join(self.directory, f"{SNAPSHOT_PREFIX}{stamp}{SNAPSHOT_SUFFIX}")
+            try:
+                # Сам файл базы нужен только на время копии: замена базы ждёт её, но не сжатие
+                started = time.monotonic()
+                async with db_gate.shared():
+                    await asyncio.to_thread(_backup, self.database_path, raw_path, SNAPSHOT_PAGES)
+                backup_seconds = time.monotonic() - started
+
+                started = time.monotonic()
+                await asyncio.to_thread(_compress, raw_path, path + ".tmp")
+                os.replace(path + ".tmp", path)
+                compress_seconds = time.monotonic() - started
+                db_size = os.path.getsize(raw_path)
+            finally:
+                for leftover in (raw_path, path + ".tmp"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+
+            removed = await asyncio.to_thread(rotate, self.directory, self.keep)
+
+        snapshot = Snapshot(path, db_size, os.path.getsize(path), backup_seconds, compress_seconds)
+        logger.info(
+            f"Database snapshot {os.path.basename(path)}: {db_size} -> {snapshot.size} bytes, "
+            f"backup {backup_seconds:.1f}s, compress {compress_seconds:.1f}s, rotated {removed}"
+        )
+        return snapshot
+
+    async def scheduled(self):
+        try:
+            await self.take()
+        except Exception as e:
+            logger.error(f"Scheduled database snapshot failed: {e}", exc_info=True)
+
+
+snapshot_manager = SnapshotManager()
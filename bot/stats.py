@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import STATS_REFRESH_INTERVAL, STATS_DAYS, STATS_MOOD_DAYS, REMINDER_CONVERSION_HOURS
+from database import async_session
+from models import DailyMood, MoodEntry, ReminderDaily, User, USER_ACTIVE
+
+logger = logging.getLogger(__name__)
+
+
+def _counter_stmt(sent: int = 0, converted: int = 0, day: Optional[date] = None):
+    stmt = insert(ReminderDaily).values(day=day or datetime.utcnow().date(), sent=sent, converted=converted)
+    return stmt.on_conflict_do_update(
+        index_elements=[ReminderDaily.day],
+        set_={
+            "sent": ReminderDaily.sent + stmt.excluded.sent,
+            "converted": ReminderDaily.converted + stmt.excluded.converted,
+        },
+    )
+
+
+async def record_reminders_sent(count: int):
+    """Один upsert на тик рассылки, а не на каждое сообщение"""
+    if not count:
+        return
+    async with async_session() as db:
+        await db.execute(_counter_stmt(sent=count))
+        await db.commit()
+
+
+async def record_conversion(db: AsyncSession, user_id: int, now: datetime):
+    """Засчитывает запись как ответ на напоминание, если оно было недавно.
+
+    Отметка напоминания снимается, поэтому второй ответ на то же
+    напоминание не считается. Коммит — на стороне вызывающего.
+    """
+    reminded_at = await db.scalar(select(User.last_reminded_at).where(User.user_id == user_id))
+    if reminded_at is None or now - reminded_at > timedelta(hours=REMINDER_CONVERSION_HOURS):
+        return
+    await db.execute(update(User).where(User.user_id == user_id).values(last_reminded_at=None))
+    await db.execute(_counter_stmt(converted=1, day=reminded_at.date()))
+
+
+@dataclass
+class DayStats:
+    day: date
+    users: int
+    entries: int
+    average: float
+
+
+@dataclass
+class StatsSnapshot:
+    collected_at: datetime
+    duration: float
+    active_users: int
+    monthly_users: int
+    days: List[DayStats]
+    moods: Dict[int, int]
+    reminders: Tuple[int, int]
+
+    @property
+    def conversion(self) -> Optional[float]:
+        sent, converted = self.reminders
+        return converted / sent if sent else None
+
+
+async def collect(db: AsyncSession, today: Optional[date] = None) -> StatsSnapshot:
+    """Несколько запросов по диапазону дат — каждый идёт по своему покрывающему индексу.
+
+    Дневные цифры берутся из daily_mood, распределение настроений — из
+    индекса (local_date, mood_code), напоминания — из reminder_daily.
+    Полных проходов по mood_entries нет, сколько бы лет истории ни было.
+    """
+    started = time.monotonic()
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=STATS_DAYS - 1)
+    month_ago = today - timedelta(days=STATS_MOOD_DAYS - 1)
+
+    day_rows = (
+        await db.execute(
+            select(DailyMood.local_date, func.count(), func.sum(DailyMood.entry_count), func.sum(DailyMood.mood_sum))
+            .where(DailyMood.local_date >= since)
+            .group_by(DailyMood.local_date)
+            .order_by(DailyMood.local_date)
+        )
+    ).all()
+    days = [DayStats(day, users, entries, mood_sum / entries) for day, users, entries, mood_sum in day_rows]
+
+    monthly_users = await db.scalar(
+        select(func.count(func.distinct(DailyMood.user_id))).where(DailyMood.local_date >= month_ago)
+    )
+    active_users = await db.scalar(select(func.count()).select_from(User).where(User.status == USER_ACTIVE))
+
+    moods = dict(
+        (
+            await db.execute(
+                select(MoodEntry.mood_code, func.count())
+                .where(MoodEntry.local_date >= month_ago)
+                .group_by(MoodEntry.mood_code)
+            )
+        ).all()
+    )
+
+    sent, converted = (
+        await db.execute(
+            select(func.coalesce(func.sum(ReminderDaily.sent), 0), func.coalesce(func.sum(ReminderDaily.converted), 0))
+            .where(ReminderDaily.day >= since)
+        )
+    ).one()
+
+    return StatsSnapshot(
+        collected_at=datetime.utcnow(),
+        duration=time.monotonic() - started,
+        active_users=active_users,
+        monthly_users=monthly_users,
+        days=days,
+        moods=moods,
+        reminders=(sent, converted),
+    )
+
+
+class StatsService:
+    """Последний снимок статистики в памяти, обновляется фоновой задачей.
+
+    /stats только читает готовый снимок, поэтому отвечает сразу и не
+    нагружает базу, сколько бы раз его ни вызывали.
+    """
+
+    def __init__(self, interval: float = STATS_REFRESH_INTERVAL):
+        self.interval = interval
+        self.snapshot: Optional[StatsSnapshot] = None
+        self._task: Optional[asyncio.Task] = None
+        self._refresh_lock = asyncio.Lock()
+
+    async def refresh(self) -> Optional[StatsSnapshot]:
+        async with self._refresh_lock:
+            try:
+                async with async_session() as db:
+                    self.snapshot = await collect(db)
+            except Exception as e:
+                logger.error(f"Failed to refresh stats: {e}", exc_info=True)
+                return self.snapshot
+        logger.debug(f"Stats refreshed in {self.snapshot.duration:.3f}s")
+        return self.snapshot
+
+    async def _refresh_loop(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+stats_service = StatsService()
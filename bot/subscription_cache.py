@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Tuple
+
+from config import CHANNEL_ID, SUBSCRIPTION_TTL, SUBSCRIPTION_NEGATIVE_TTL
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIBED_STATUSES = ("member", "administrator", "creator")
+
+
+class SubscriptionCache:
+    """Общий кэш статуса подписки на канал с single-flight.
+
+    Положительный ответ живёт SUBSCRIPTION_TTL, отрицательный — короче,
+    чтобы только что подписавшийся не ждал. Параллельные проверки одного
+    пользователя ждут один и тот же запрос get_chat_member. Ошибки API не
+    кэшируются и пробрасываются вызывающему.
+    """
+
+    MAX_ENTRIES = 100_000
+
+    def __init__(self, ttl: float = SUBSCRIPTION_TTL, negative_ttl: float = SUBSCRIPTION_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[int, Tuple[bool, float]] = {}
+        self._inflight: Dict[int, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+
+    def set(self, user_id: int, subscribed: bool):
+        ttl = self.ttl if subscribed else self.negative_ttl
+        if len(self._entries) >= self.MAX_ENTRIES:
+            self._prune()
+        self._entries[user_id] = (subscribed, time.monotonic() + ttl)
+
+    def set_status(self, user_id: int, status: str):
+        self.set(user_id, status in SUBSCRIBED_STATUSES)
+
+    def invalidate(self, user_id: int):
+        self._entries.pop(user_id, None)
+
+    def _prune(self):
+        now = time.monotonic()
+        for user_id in [uid for uid, (_, expires) in self._entries.items() if expires <= now]:
+            del self._entries[user_id]
+        if len(self._entries) >= self.MAX_ENTRIES:
+            self._entries.clear()
+
+    async def _fetch(self, bot, user_id: int) -> bool:
+        member = await bot.get_chat_member(CHANNEL_ID, user_id)
+        logger.debug(f"User {user_id} status: {member.status}")
+        subscribed = member.status in SUBSCRIBED_STATUSES
+        self.set(user_id, subscribed)
+        return subscribed
+
+    async def is_subscribed(self, bot, user_id: int) -> bool:
+        if not CHANNEL_ID:
+            return True
+
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            subscribed, expires = entry
+            if expires > time.monotonic():
+                self.hits += 1
+                return subscribed
+            del self._entries[user_id]
+
+        inflight = self._inflight.get(user_id)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+            # Задачу, которая делала запрос, отменили — проверяем сами
+            return await self.is_subscribed(bot, user_id)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[user_id] = future
+        try:
+            subscribed = await self._fetch(bot, user_id)
+        except Exception as e:
+            self.errors += 1
+            future.set_exception(e)
+            # Исключение уже отдано ждущим; помечаем его полученным
+            future.exception()
+            raise
+        except BaseException:
+            # Отмена (или выход): ждущие не должны висеть на будущем без результата
+            future.cancel()
+            raise
+        else:
+            future.set_result(subscribed)
+            return subscribed
+        finally:
+            self._inflight.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "size": len(self._entries),
+        }
+
+
+subscription_cache = SubscriptionCache()
@@ -0,0 +1,135 @@
+import asyncio
+import hmac
+import logging
+from typing import List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_HOST,
+    WEBHOOK_PORT,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Приём апдейтов вебхуком: быстрый 200 и обработка в фоне.
+
+    Апдейт проверяется по секретному токену, кладётся в ограниченную
+    очередь и сразу подтверждается. Пул воркеров скармливает очередь
+    диспетчеру. Если очередь полна, отвечаем 503 — Telegram повторит
+    доставку позже, а не потеряет апдейт.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        secret: Optional[str] = WEBHOOK_SECRET,
+        queue_size: int = WEBHOOK_QUEUE_SIZE,
+        workers: int = WEBHOOK_WORKERS,
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks: List[asyncio.Task] = []
+        self.received = 0
+        self.rejected = 0
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), self.secret
+        ):
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except Exception as e:
+            logger.warning(f"Malformed webhook update: {e}")
+            return web.Response(status=400)
+
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning(f"Webhook queue is full, rejecting update {update.update_id}")
+            return web.Response(status=503)
+
+        self.received += 1
+        return web.Response()
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "queue": self.queue.qsize(),
+            "received": self.received,
+            "rejected": self.rejected,
+        })
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Error processing update {update.update_id}: {e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+    async def on_startup(self, app: web.Application):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if WEBHOOK_URL:
+            await self.bot.set_webhook(
+                url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=self.secret,
+                allowed_updates=self.dp.resolve_used_update_types(),
+            )
+            logger.info(f"Webhook set to {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+    async def on_shutdown(self, app: web.Application):
+        # Дорабатываем уже принятые апдейты, но не дольше 10 секунд
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=10)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.queue.qsize()} unprocessed updates on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def build_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(WEBHOOK_PATH, self.handle_update)
+        app.router.add_get("/healthz", self.handle_health)
+        app.on_startup.append(self.on_startup)
+        app.on_shutdown.append(self.on_shutdown)
+        return app
+
+
+def run_webhook(dp: Dispatcher, bot: Bot):
+    server = WebhookServer(dp, bot)
+    app = server.build_app()
+
+    async def emit_startup(app: web.Application):
+        await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+
+    async def emit_shutdown(app: web.Application):
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+
+    # Сначала поднимаем БД и пулы, потом воркеры; при остановке — в обратном порядке
+    app.on_startup.insert(0, emit_startup)
+    app.on_shutdown.append(emit_shutdown)
+
+    logger.info(f"Starting webhook server on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+    web.run_app(app, host=WEBHOOK_HOST, port=WEBHOOK_PORT, print=None)